@@ -0,0 +1,109 @@
+import numpy as np
+
+ALL_FACES = 0x3F
+FACE_MASK_UNKNOWN = 0xFF
+
+class BatchTable:
+  """
+  Batches stored as NumPy columns. face_masks has bit i set when face i
+  (in get_cube_faces order) is exposed. Removed rows go on a free list and are
+  handed out again by add(); compact() packs live rows to the front and
+  returns the old -> new id mapping.
+  """
+  def __init__(self, capacity=1024):
+    self.positions = np.zeros((capacity, 3), dtype=np.int32)
+    self.sizes = np.zeros(capacity, dtype=np.int32)
+    self.colors = np.zeros(capacity, dtype=np.int32)
+    self.geometry_slots = np.full(capacity, -1, dtype=np.int32)
+    self.face_masks = np.zeros(capacity, dtype=np.uint8)
+    self.alive = np.zeros(capacity, dtype=bool)
+    self.free = []
+    self.high_water = 0
+    self.live_count = 0
+
+  def __len__(self):
+    return self.live_count
+
+  def __contains__(self, batch_id):
+    return 0 <= batch_id < self.high_water and bool(self.alive[batch_id])
+
+  @property
+  def capacity(self):
+    return len(self.sizes)
+
+  @property
+  def fragmentation(self):
+    if self.high_water == 0:
+      return 0.0
+    return len(self.free) / self.high_water
+
+  def _reserve(self, capacity):
+    if capacity <= self.capacity:
+      return
+    new_capacity = max(capacity, self.capacity * 2)
+    grow = new_capacity - self.capacity
+    self.positions = np.concatenate([self.positions, np.zeros((grow, 3), dtype=np.int32)])
+    self.sizes = np.concatenate([self.sizes, np.zeros(grow, dtype=np.int32)])
+    self.colors = np.concatenate([self.colors, np.zeros(grow, dtype=np.int32)])
+    self.geometry_slots = np.concatenate([self.geometry_slots, np.full(grow, -1, dtype=np.int32)])
+    self.face_masks = np.concatenate([self.face_masks, np.zeros(grow, dtype=np.uint8)])
+    self.alive = np.concatenate([self.alive, np.zeros(grow, dtype=bool)])
+
+  def allocate(self, count):
+    reused = min(count, len(self.free))
+    ids = [self.free.pop() for _ in range(reused)]
+    fresh = count - reused
+    self._reserve(self.high_water + fresh)
+    ids.extend(range(self.high_water, self.high_water + fresh))
+    self.high_water += fresh
+    ids = np.array(ids, dtype=np.int64)
+    self.alive[ids] = True
+    self.live_count += count
+    return ids
+
+  def add(self, positions, sizes, colors):
+    positions = np.asarray(positions).reshape(-1, 3)
+    ids = self.allocate(len(positions))
+    self.positions[ids] = positions
+    self.sizes[ids] = sizes
+    self.colors[ids] = colors
+    self.geometry_slots[ids] = ids
+    self.face_masks[ids] = FACE_MASK_UNKNOWN
+    return ids
+
+  def release(self, ids):
+    ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+    ids = ids[(ids >= 0) & (ids < self.high_water)]
+    ids = np.unique(ids[self.alive[ids]])
+    self.alive[ids] = False
+    self.geometry_slots[ids] = -1
+    self.free.extend(ids.tolist())
+    self.live_count -= len(ids)
+    return ids
+
+  def live_ids(self):
+    return np.nonzero(self.alive[:self.high_water])[0]
+
+  def compact(self):
+    live = self.live_ids()
+    mapping = np.full(self.high_water, -1, dtype=np.int64)
+    mapping[live] = np.arange(len(live))
+    count = len(live)
+    self.positions[:count] = self.positions[live]
+    self.sizes[:count] = self.sizes[live]
+    self.colors[:count] = self.colors[live]
+    self.geometry_slots[:count] = np.where(self.geometry_slots[live] >= 0, np.arange(count), -1)
+    self.face_masks[:count] = self.face_masks[live]
+    self.alive[:count] = True
+    self.alive[count:] = False
+    self.geometry_slots[count:] = -1
+    self.free = []
+    self.high_water = count
+    return mapping
+
+  def clear(self):
+    self.alive[:] = False
+    self.geometry_slots[:] = -1
+    self.free = []
+    self.high_water = 0
+    self.live_count = 0
@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from voxels import Voxels
+from mesh_builder import mesh_batches, mesh_store
+from io_vox import VOXHelper, VOXImporter
+from io_vld import VLDFile, VLDHelper
+from io_565 import Exporter565
+
+PALETTE_SIZE = 16
+
+def build_scene(size, density, seed=0):
+  """Random cells filling density of a size^3 world, colored from a small palette."""
+  rng = np.random.default_rng(seed)
+  count = max(int(size ** 3 * density), 1)
+  cells = np.unravel_index(rng.choice(size ** 3, count, replace=False), (size, size, size))
+  positions = np.stack(cells, axis=1).astype(np.int64)
+  palette = rng.random((PALETTE_SIZE, 3)).round(3)
+  colors = palette[rng.integers(0, PALETTE_SIZE, count)]
+  return positions, colors
+
+def write_vox(path, size, positions, colors):
+  palette, color_index = np.unique(colors, axis=0, return_inverse=True)
+  xyzi = np.empty((len(positions), 4), dtype=np.uint8)
+  xyzi[:, :3] = positions
+  xyzi[:, 3] = color_index.ravel() + 1
+  rgba = np.full((256, 4), 255, dtype=np.uint8)
+  rgba[:len(palette), :3] = np.rint(palette * 255)
+
+  def chunk(chunk_id, content, children=b''):
+    return chunk_id + struct.pack('<II', len(content), len(children)) + content + children
+
+  body = chunk(b'SIZE', struct.pack('<3I', size, size, size))
+  body += chunk(b'XYZI', struct.pack('<I', len(xyzi)) + xyzi.tobytes())
+  body += chunk(b'RGBA', rgba.tobytes())
+  with open(path, 'wb') as f:
+    f.write(b'VOX ' + struct.pack('<I', 150) + chunk(b'MAIN', b'', body))
+
+def loaded_voxels(positions, colors):
+  voxels = Voxels()
+  voxels.add_many(positions, 1, colors)
+  return voxels
+
+def case_add_many(scene, workdir, edits):
+  positions, colors = scene
+  def run():
+    Voxels().add_many(positions, 1, colors)
+    return len(positions)
+  return run
+
+def case_add_batch(scene, workdir, edits):
+  positions, colors = scene
+  voxels = loaded_voxels(positions[edits:], colors[edits:])
+  def run():
+    for position, color in zip(positions[:edits].tolist(), colors[:edits].tolist()):
+      voxels.add_batch(tuple(position), 1, color)
+    return min(edits, len(positions))
+  return run
+
+def case_remove_batch(scene, workdir, edits):
+  positions, colors = scene
+  voxels = loaded_voxels(positions, colors)
+  ids = voxels.batches.live_ids()[:edits].tolist()
+  def run():
+    for voxel_id in ids:
+      voxels.remove_batch(voxel_id)
+    return len(ids)
+  return run
+
+def case_mesh_greedy(scene, workdir, edits):
+  voxels = loaded_voxels(*scene)
+  def run():
+    mesh_store(voxels.voxels, voxels.palette)
+    return len(voxels.voxels)
+  return run
+
+def case_mesh_faces(scene, workdir, edits):
+  voxels = loaded_voxels(*scene)
+  ids = voxels.batches.live_ids()
+  colors = np.array(voxels.palette, dtype=np.float32)[voxels.batches.colors[ids]]
+  def run():
+    mesh_batches(voxels.voxels, voxels.batches.positions[ids], voxels.batches.sizes[ids], colors)
+    return len(ids)
+  return run
+
+def case_vox_load(scene, workdir, edits, mapped=False):
+  positions, colors = scene
+  path = os.path.join(workdir, 'scene.vox')
+  write_vox(path, int(positions.max()) + 1, positions, colors)
+  def run():
+    models, _ = VOXImporter().load_vox_file(path, mapped=mapped)
+    return sum(len(model['voxels']) for model in models)
+  return run
+
+def case_vox_load_mapped(scene, workdir, edits):
+  return case_vox_load(scene, workdir, edits, mapped=True)
+
+def case_vox_import(scene, workdir, edits):
+  positions, colors = scene
+  path = os.path.join(workdir, 'scene.vox')
+  write_vox(path, int(positions.max()) + 1, positions, colors)
+  def run():
+    target = Voxels()
+    VOXHelper.import_vox(target, path)
+    return len(target.batches)
+  return run
+
+def case_vld_save(scene, workdir, edits):
+  voxels = loaded_voxels(*scene)
+  path = os.path.join(workdir, 'scene.vld')
+  def run():
+    VLDFile().save(path, {"voxels": VLDHelper.export_voxels(voxels)})
+    return len(voxels.batches)
+  return run
+
+def case_vld_load(scene, workdir, edits):
+  voxels = loaded_voxels(*scene)
+  path = os.path.join(workdir, 'scene.vld')
+  VLDFile().save(path, {"voxels": VLDHelper.export_voxels(voxels)})
+  def run():
+    target = Voxels()
+    VLDHelper.import_voxels(target, VLDFile().open(path)["voxels"])
+    return len(target.batches)
+  return run
+
+def case_export_565(scene, workdir, edits):
+  voxels = loaded_voxels(*scene)
+  exporter = Exporter565(voxels)
+  path = os.path.join(workdir, 'scene.bin')
+  def run():
+    exporter.export_to_file(path)
+    return len(voxels.voxels)
+  return run
+
+CASES = {
+  'add_many': case_add_many,
+  'add_batch': case_add_batch,
+  'remove_batch': case_remove_batch,
+  'mesh_greedy': case_mesh_greedy,
+  'mesh_faces': case_mesh_faces,
+  'vox_load': case_vox_load,
+  'vox_load_mapped': case_vox_load_mapped,
+  'vox_import': case_vox_import,
+  'vld_save': case_vld_save,
+  'vld_load': case_vld_load,
+  'export_565': case_export_565,
+}
+
+def measure(case, scene, workdir, edits, repeat):
+  best = None
+  for _ in range(repeat):
+    run = case(scene, workdir, edits)
+    start = time.perf_counter()
+    count = run()
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+
+  run = case(scene, workdir, edits)
+  tracemalloc.start()
+  run()
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return {
+    'seconds': best,
+    'peak_bytes': peak,
+    'voxels': count,
+    'voxels_per_second': count / best if best > 0 else float('inf'),
+  }
+
+def result_key(result):
+  return (result['case'], result['size'], result['density'])
+
+def find_regressions(results, baseline, threshold):
+  previous = {result_key(r): r for r in baseline['results']}
+  regressions = []
+  for result in results:
+    old = previous.get(result_key(result))
+    if old is not None and result['seconds'] > old['seconds'] * (1 + threshold):
+      regressions.append((result, old))
+  return regressions
+
+def main():
+  parser = argparse.ArgumentParser(description="Time the editor's hot paths headlessly on synthetic scenes")
+  parser.add_argument('--sizes', type=int, nargs='+', default=[16, 64, 256])
+  parser.add_argument('--densities', type=float, nargs='+', default=[0.01, 0.05, 0.2])
+  parser.add_argument('--cases', nargs='+', default=list(CASES), choices=list(CASES))
+  parser.add_argument('--edits', type=int, default=2000, help="voxels added/removed one by one per add_batch/remove_batch run")
+  parser.add_argument('--max-voxels', type=int, default=500000, help="skip export_565 (per-voxel Python loop) on larger scenes")
+  parser.add_argument('--repeat', type=int, default=1)
+  parser.add_argument('--output', default='benchmark_results.json')
+  parser.add_argument('--baseline', help="JSON from an earlier run to compare wall times against")
+  parser.add_argument('--threshold', type=float, default=0.25, help="allowed slowdown against the baseline, as a fraction")
+  args = parser.parse_args()
+
+  results = []
+  print(f"{'case':>15} {'size':>5} {'density':>8} {'voxels':>9} {'seconds':>9} {'peak MB':>8} {'voxels/s':>11}")
+  with tempfile.TemporaryDirectory() as workdir:
+    for size in args.sizes:
+      for density in args.densities:
+        scene = build_scene(size, density)
+        for name in args.cases:
+          if name == 'export_565' and len(scene[0]) > args.max_voxels:
+            continue
+          result = {'case': name, 'size': size, 'density': density}
+          result.update(measure(CASES[name], scene, workdir, args.edits, args.repeat))
+          results.append(result)
+          print(f"{name:>15} {size:>5} {density:>8} {result['voxels']:>9} {result['seconds']:>9.3f} "
+                f"{result['peak_bytes'] / 2**20:>8.1f} {result['voxels_per_second']:>11.0f}")
+
+  with open(args.output, 'w') as f:
+    json.dump({'python': sys.version.split()[0], 'numpy': np.__version__, 'results': results}, f, indent=2)
+  print(f"Results written to {args.output}")
+
+  if args.baseline:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.threshold)
+    for result, old in regressions:
+      print(f"Regression: {result['case']} size {result['size']} density {result['density']}: "
+            f"{old['seconds']:.3f}s -> {result['seconds']:.3f}s")
+    if regressions:
+      sys.exit(1)
+
+if __name__ == '__main__':
+  main()
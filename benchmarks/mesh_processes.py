@@ -0,0 +1,96 @@
+import argparse
+import time
+import numpy as np
+from voxel_store import ChunkedVoxelStore, CHUNK_SIZE
+from mesh_builder import mesh_chunk_cells, mesh_faces, read_chunk
+from mesh_pool import MeshPool
+from voxels import Voxels
+
+def terrain_cells(world_size, seed=0):
+  """Rolling heightmap filling roughly a quarter of the world, plus floating noise."""
+  rng = np.random.default_rng(seed)
+  x, z = np.meshgrid(np.arange(world_size), np.arange(world_size), indexing='ij')
+  waves = np.sin(x / 17.0) * np.cos(z / 23.0) + 0.5 * np.sin((x + z) / 9.0)
+  heights = (world_size / 4 + waves * world_size / 10).astype(np.int64).clip(1, world_size)
+  columns = np.repeat(np.stack([x.ravel(), z.ravel()], axis=1), heights.ravel(), axis=0)
+  y = np.concatenate([np.arange(h) for h in heights.ravel().tolist()])
+  cells = np.stack([columns[:, 0], y, columns[:, 1]], axis=1)
+  floating = rng.integers(0, world_size, size=(world_size ** 3 // 64, 3))
+  cells = np.concatenate([cells, floating])
+  colors = (cells[:, 1] * 8 // world_size + rng.integers(0, 2, len(cells))).astype(np.int64)
+  palette = rng.random((int(colors.max()) + 1, 3)).astype(np.float32)
+  return cells, colors, palette
+
+def greedy_tasks(world_size):
+  cells, colors, palette = terrain_cells(world_size)
+  store = ChunkedVoxelStore()
+  store.set_many(cells, np.arange(len(cells)), colors)
+  keys = sorted(store.chunk_keys(CHUNK_SIZE))
+  return len(cells), [(key, read_chunk(store, key), palette) for key in keys]
+
+def faces_tasks(world_size):
+  """
+  One size-1 batch per cell, loaded the way the viewer does it: with the
+  mesh worker running, so faces are left to the per-chunk tasks.
+  """
+  cells, colors, palette = terrain_cells(world_size)
+  scene = Voxels()
+  scene.start_mesh_worker()
+  scene.add_many(cells, 1, palette[colors])
+  palette = np.array(scene.palette, dtype=np.float32)
+  tasks = scene.faces_tasks(sorted(scene.chunk_batches), palette)
+  scene.cleanup()
+  return len(cells), tasks
+
+MODES = {
+  'greedy': (
+    greedy_tasks,
+    lambda tasks: {key: mesh_chunk_cells(key, cells, palette) for key, cells, palette in tasks},
+    MeshPool.mesh_chunks,
+    lambda meshes: sum(len(m['vertices']) for m in meshes.values() if m is not None)
+  ),
+  'faces': (
+    faces_tasks,
+    lambda tasks: {key: mesh_faces(*args) for key, args in tasks},
+    MeshPool.mesh_faces,
+    lambda results: sum(len(r[2][0]) for r in results.values() if r[2] is not None)
+  ),
+}
+
+def main():
+  parser = argparse.ArgumentParser(description="Meshing of a full scene in one process vs a process pool")
+  parser.add_argument('--mode', choices=sorted(MODES), default='greedy')
+  parser.add_argument('--size', type=int, default=256)
+  parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+  parser.add_argument('--repeat', type=int, default=3)
+  args = parser.parse_args()
+
+  build_tasks, mesh_in_process, mesh_in_pool, vertex_total = MODES[args.mode]
+  voxel_count, tasks = build_tasks(args.size)
+  print(f"{args.size}^3 scene, {args.mode} mode: {voxel_count} voxels in {len(tasks)} chunks")
+
+  timings = []
+  for _ in range(args.repeat):
+    start = time.perf_counter()
+    meshes = mesh_in_process(tasks)
+    timings.append(time.perf_counter() - start)
+  baseline = min(timings)
+  vertices = vertex_total(meshes)
+  print(f"{'workers':>8} {'seconds':>8} {'speedup':>8} {'vertices':>10}")
+  print(f"{'inline':>8} {baseline:>8.2f} {1.0:>8.2f} {vertices:>10}")
+
+  for workers in args.workers:
+    pool = MeshPool(workers)
+    mesh_in_pool(pool, tasks[:workers])
+    timings = []
+    for _ in range(args.repeat):
+      start = time.perf_counter()
+      meshes = mesh_in_pool(pool, tasks)
+      timings.append(time.perf_counter() - start)
+    pool.close()
+    if vertex_total(meshes) != vertices:
+      raise RuntimeError(f"{workers} workers produced {vertex_total(meshes)} vertices, expected {vertices}")
+    print(f"{workers:>8} {min(timings):>8.2f} {baseline / min(timings):>8.2f} {vertex_total(meshes):>10}")
+
+if __name__ == '__main__':
+  main()
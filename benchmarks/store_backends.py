@@ -0,0 +1,92 @@
+import argparse
+import time
+import tracemalloc
+import numpy as np
+from voxel_store import VOXEL_STORES
+
+class DictVoxelStore:
+  """Per-cell dict layout Voxels used before the chunked store, kept as a baseline."""
+  def __init__(self):
+    self.voxels = {}
+
+  def __len__(self):
+    return len(self.voxels)
+
+  def set(self, pos, batch_id, color_index):
+    self.voxels[pos] = {'voxel_id': batch_id, 'size': 1}
+
+  def get(self, pos, default=-1):
+    info = self.voxels.get(pos)
+    return default if info is None else info['voxel_id']
+
+def build_scene(world_size, seed=0):
+  rng = np.random.default_rng(seed)
+  cells = []
+  floor = np.indices((world_size, 1, world_size)).reshape(3, -1).T
+  cells.append(floor)
+  block = world_size // 8
+  solid = np.indices((block, block, block)).reshape(3, -1).T + world_size // 2
+  cells.append(solid)
+  scattered = rng.integers(0, world_size, size=(world_size * 16, 3))
+  cells.append(scattered)
+  return [tuple(p) for p in np.concatenate(cells).tolist()]
+
+def fill(store, cells):
+  for i, pos in enumerate(cells):
+    store.set(pos, i & 0xFFFF, i & 0xFF)
+
+def measure(name, factory, cells, world_size, queries, rng):
+  tracemalloc.start()
+  store = factory()
+  fill(store, cells)
+  memory = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+
+  points = [tuple(p) for p in rng.integers(0, world_size, size=(queries, 3)).tolist()]
+  start = time.perf_counter()
+  for pos in points:
+    store.get(pos)
+  point_time = (time.perf_counter() - start) / queries
+
+  box = 8
+  origins = [tuple(p) for p in rng.integers(0, world_size - box, size=(max(queries // 1000, 1), 3)).tolist()]
+  start = time.perf_counter()
+  for ox, oy, oz in origins:
+    if hasattr(store, 'read_box'):
+      store.read_box((ox, oy, oz), box)
+      continue
+    for dx in range(box):
+      for dy in range(box):
+        for dz in range(box):
+          store.get((ox + dx, oy + dy, oz + dz))
+  box_time = (time.perf_counter() - start) / len(origins)
+
+  return {
+    'backend': name,
+    'world_size': world_size,
+    'cells': len(store),
+    'memory_bytes': memory,
+    'point_query_us': point_time * 1e6,
+    'box_query_us': box_time * 1e6,
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description="Compare voxel store backends")
+  parser.add_argument('--sizes', type=int, nargs='+', default=[64, 256, 512])
+  parser.add_argument('--queries', type=int, default=100000)
+  parser.add_argument('--backends', nargs='+', default=['dict'] + list(VOXEL_STORES))
+  args = parser.parse_args()
+
+  factories = dict(VOXEL_STORES)
+  factories['dict'] = DictVoxelStore
+
+  print(f"{'backend':>8} {'world':>6} {'cells':>9} {'memory MB':>10} {'point us':>9} {'8^3 box us':>11}")
+  for world_size in args.sizes:
+    cells = build_scene(world_size)
+    for name in args.backends:
+      result = measure(name, factories[name], cells, world_size, args.queries, np.random.default_rng(1))
+      print(f"{name:>8} {world_size:>6} {result['cells']:>9} {result['memory_bytes'] / 2**20:>10.1f} "
+            f"{result['point_query_us']:>9.2f} {result['box_query_us']:>11.1f}")
+
+if __name__ == '__main__':
+  main()
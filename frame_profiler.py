@@ -0,0 +1,98 @@
+import csv
+import json
+import time
+import numpy as np
+
+class FrameProfiler:
+  """
+  Per-stage CPU timings of the frame loop. begin_frame() starts a frame and
+  each mark(name) records the time since the previous mark under name, so
+  the main loop only needs one call after every stage. Samples go into
+  frame-aligned ring buffers of the last capacity frames; stages that did
+  not run in a frame are left as NaN. Note that GL calls are asynchronous,
+  so draw stages measure command submission, not GPU time.
+  """
+  def __init__(self, capacity=240, summary_interval=0.25):
+    self.capacity = capacity
+    self.summary_interval = summary_interval
+    self.samples = {}
+    self.frame_times = np.full(capacity, np.nan)
+    self.frame = -1
+    self.counters = {}
+    self._frame_start = 0.0
+    self._last_mark = 0.0
+    self._summary = {}
+    self._summary_time = 0.0
+
+  def begin_frame(self):
+    now = time.perf_counter()
+    if self.frame >= 0:
+      self.frame_times[self.frame % self.capacity] = now - self._frame_start
+    self.frame += 1
+    slot = self.frame % self.capacity
+    self.frame_times[slot] = np.nan
+    for samples in self.samples.values():
+      samples[slot] = np.nan
+    self._frame_start = self._last_mark = now
+
+  def mark(self, name):
+    now = time.perf_counter()
+    samples = self.samples.get(name)
+    if samples is None:
+      samples = self.samples[name] = np.full(self.capacity, np.nan)
+    samples[self.frame % self.capacity] = now - self._last_mark
+    self._last_mark = now
+
+  def set_counter(self, name, value):
+    self.counters[name] = value
+
+  def summary(self):
+    """
+    {stage: (p50, p99, last) in milliseconds}, where last is the previous
+    (complete) frame. Recomputed at most every summary_interval seconds.
+    """
+    now = time.perf_counter()
+    if now - self._summary_time < self.summary_interval:
+      return self._summary
+    self._summary_time = now
+    stages = dict(self.samples)
+    stages['frame'] = self.frame_times
+    summary = {}
+    previous = (self.frame - 1) % self.capacity
+    for name, samples in stages.items():
+      valid = samples[~np.isnan(samples)]
+      if not len(valid):
+        continue
+      p50, p99 = np.percentile(valid, [50, 99]) * 1000.0
+      summary[name] = (float(p50), float(p99), float(samples[previous]) * 1000.0)
+    self._summary = summary
+    return summary
+
+  def _rows(self):
+    first = max(self.frame - self.capacity + 1, 0)
+    for frame in range(first, self.frame):
+      slot = frame % self.capacity
+      yield frame, [self.frame_times[slot]] + [samples[slot] for samples in self.samples.values()]
+
+  def dump(self, path):
+    """Writes the buffered frames (CSV, one row per frame) or the summary and frames (JSON)."""
+    names = ['frame'] + list(self.samples)
+    if path.endswith('.csv'):
+      with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['index'] + [f"{name}_ms" for name in names])
+        for frame, values in self._rows():
+          writer.writerow([frame] + ['' if np.isnan(v) else f"{v * 1000.0:.4f}" for v in values])
+    else:
+      self._summary_time = 0.0
+      data = {
+        'summary_ms': {name: dict(zip(('p50', 'p99', 'last'), values)) for name, values in self.summary().items()},
+        'counters': self.counters,
+        'frames': [
+          dict(index=frame, **{name: None if np.isnan(v) else v * 1000.0 for name, v in zip(names, values)})
+          for frame, values in self._rows()
+        ]
+      }
+      with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+    print(f"Frame profile written to {path}")
@@ -0,0 +1,56 @@
+import sys
+import time
+import tracemalloc
+
+class FrameStats:
+  """
+  Counts Python allocations made during each frame while enabled.
+  sys.getallocatedblocks() gives the net number of memory blocks left behind
+  by a frame; tracemalloc's peak catches temporaries that are allocated and
+  freed within the frame. Averages are printed every report_interval seconds.
+  """
+  def __init__(self, report_interval=1.0):
+    self.report_interval = report_interval
+    self.enabled = False
+    self._reset()
+
+  def _reset(self):
+    self.frames = 0
+    self.blocks = 0
+    self.peak_bytes = 0
+    self.last_report = time.time()
+    self._start_blocks = 0
+    self._start_bytes = 0
+
+  def toggle(self):
+    self.enabled = not self.enabled
+    if self.enabled:
+      tracemalloc.start()
+      self._reset()
+    else:
+      tracemalloc.stop()
+    print(f"Allocation tracing {'on' if self.enabled else 'off'}")
+
+  def begin_frame(self):
+    if not self.enabled:
+      return
+    tracemalloc.reset_peak()
+    self._start_bytes = tracemalloc.get_traced_memory()[0]
+    self._start_blocks = sys.getallocatedblocks()
+
+  def end_frame(self):
+    if not self.enabled:
+      return
+    blocks = sys.getallocatedblocks() - self._start_blocks
+    peak = tracemalloc.get_traced_memory()[1]
+    self.frames += 1
+    self.blocks += blocks
+    self.peak_bytes += peak - self._start_bytes
+    if time.time() - self.last_report >= self.report_interval:
+      print(self.report())
+      self._reset()
+
+  def report(self):
+    frames = max(self.frames, 1)
+    return (f"{self.frames} frames: {self.blocks / frames:.1f} blocks/frame net, "
+            f"{self.peak_bytes / frames / 1024:.1f} KiB/frame peak")
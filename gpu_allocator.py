@@ -0,0 +1,78 @@
+import bisect
+
+class RangeAllocator:
+  """
+  First-fit free-list allocator over the item range [0, capacity). Free
+  ranges are kept sorted by offset and merged with their neighbours on
+  release. Knows nothing about OpenGL: the owner grows the real buffer when
+  allocate() returns None and then calls grow().
+  """
+  def __init__(self, capacity=0):
+    self.capacity = 0
+    self.free_offsets = []
+    self.free_sizes = []
+    self.allocations = {}
+    self.grow(capacity)
+
+  def __len__(self):
+    return len(self.allocations)
+
+  @property
+  def used(self):
+    return self.capacity - sum(self.free_sizes)
+
+  @property
+  def largest_free(self):
+    return max(self.free_sizes, default=0)
+
+  @property
+  def fragmentation(self):
+    free = self.capacity - self.used
+    if free == 0:
+      return 0.0
+    return 1.0 - self.largest_free / free
+
+  def allocate(self, size):
+    if size <= 0:
+      raise ValueError(f"Cannot allocate {size} items")
+    for i, free_size in enumerate(self.free_sizes):
+      if free_size < size:
+        continue
+      offset = self.free_offsets[i]
+      if free_size == size:
+        del self.free_offsets[i]
+        del self.free_sizes[i]
+      else:
+        self.free_offsets[i] += size
+        self.free_sizes[i] -= size
+      self.allocations[offset] = size
+      return offset
+    return None
+
+  def release(self, offset):
+    size = self.allocations.pop(offset)
+    self._insert_free(offset, size)
+
+  def grow(self, capacity):
+    if capacity < self.capacity:
+      raise ValueError(f"Cannot shrink allocator from {self.capacity} to {capacity}")
+    if capacity > self.capacity:
+      self._insert_free(self.capacity, capacity - self.capacity)
+      self.capacity = capacity
+
+  def clear(self):
+    self.allocations.clear()
+    self.free_offsets = [0] if self.capacity else []
+    self.free_sizes = [self.capacity] if self.capacity else []
+
+  def _insert_free(self, offset, size):
+    i = bisect.bisect_left(self.free_offsets, offset)
+    if i < len(self.free_offsets) and offset + size == self.free_offsets[i]:
+      size += self.free_sizes[i]
+      del self.free_offsets[i]
+      del self.free_sizes[i]
+    if i > 0 and self.free_offsets[i - 1] + self.free_sizes[i - 1] == offset:
+      self.free_sizes[i - 1] += size
+    else:
+      self.free_offsets.insert(i, offset)
+      self.free_sizes.insert(i, size)
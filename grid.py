@@ -266,11 +266,8 @@ class Grid:
        self._update_arrow_geometry()
 
  def draw_grid(self, pv_matrix):
-   model = np.eye(4, dtype=np.float32)
-   mvp = pv_matrix @ model
-
    glUseProgram(self.shader_program)
-   glUniformMatrix4fv(self.mvp_location, 1, GL_FALSE, mvp.T)
+   glUniformMatrix4fv(self.mvp_location, 1, GL_TRUE, pv_matrix)
 
    glUniform3f(self.color_location, 0.312, 0.48, 0.48)
    glBindVertexArray(self.grid_vao)
@@ -281,11 +278,8 @@ class Grid:
 
  def draw(self, pv_matrix):
    glDisable(GL_DEPTH_TEST)
-   model = np.eye(4, dtype=np.float32)
-   mvp = pv_matrix @ model
-
    glUseProgram(self.shader_program)
-   glUniformMatrix4fv(self.mvp_location, 1, GL_FALSE, mvp.T)
+   glUniformMatrix4fv(self.mvp_location, 1, GL_TRUE, pv_matrix)
 
    glUniform3f(self.color_location, 1.0, 0.5, 0.0)
    glBindVertexArray(self.world_vao)
@@ -22,12 +22,10 @@ class Exporter565:
 
   def export_to_file(self, filename="./object_0.bin"):
     coords = {}
+    positions, _, _ = self.voxels.voxels.occupied()
 
-    for (x, y, z), info in self.voxels.blocks.items():
-      block_id = info['block_id']
-      batch = self.voxels.batches[block_id]
-      voxel_local_index = self._find_voxel_local_index(batch, x, y, z)
-      color = self._get_voxel_color(batch['vertices'], voxel_local_index)
+    for x, y, z in positions.tolist():
+      color = self.voxels.get_color((x, y, z))
       smoothed_color = self._smooth_color_with_neighbors(x, y, z, color)
 
       export_x, export_y, export_z = self._transform_coordinates(x, y, z)
@@ -73,16 +71,6 @@ class Exporter565:
       return x, -y, z
     return x, y, z
 
-  def _get_voxel_color(self, vertices, voxel_index):
-    vertex_start = voxel_index * 24 * 9
-    if vertex_start + 8 < len(vertices):
-      return [
-        vertices[vertex_start + 6],
-        vertices[vertex_start + 7],
-        vertices[vertex_start + 8]
-      ]
-    return [1.0, 1.0, 1.0]
-
   def _smooth_color_with_neighbors(self, x, y, z, base_color):
     neighbors = [
       (x+1, y, z), (x-1, y, z),
@@ -94,28 +82,14 @@ class Exporter565:
     count = 1.0
    
     for nx, ny, nz in neighbors:
-      neighbor_key = (nx, ny, nz)
-      if neighbor_key in self.voxels.blocks:
-        info = self.voxels.blocks[neighbor_key]
-        block_id = info['block_id']
-        batch = self.voxels.batches[block_id]
-        voxel_local_index = self._find_voxel_local_index(batch, nx, ny, nz)
-        neighbor_color = self._get_voxel_color(batch['vertices'], voxel_local_index)
+      neighbor_color = self.voxels.get_color((nx, ny, nz))
+      if neighbor_color is not None:
         total_color += np.array(neighbor_color)
         count += 1.0
     
     smoothed = total_color / count
     return [smoothed[0], smoothed[1], smoothed[2]]
 
-  def _find_voxel_local_index(self, batch, x, y, z):
-    px, py, pz = batch['position']
-    size = batch['size']
-    dx = (x - px) // size
-    dy = (y - py) // size
-    dz = (z - pz) // size
-    dim = int(batch['dim'])
-    return dx + dy * dim + dz * dim * dim
-
   def set_color_levels(self, red=0.9, green=1.0, blue=1.5):
     self.OPT_MODEL_RED_LEVEL = red
     self.OPT_MODEL_GREEN_LEVEL = green
@@ -1,7 +1,9 @@
 import struct
+import numpy as np
 
 SECTION_NAME_SIZE = 256
 UINT32_SIZE = 4
+VOXEL_ENTRY_DTYPE = np.dtype([('position', '<i4', 3), ('size', '<u4'), ('color', '<f4', 3)])
 
 class VLDFile:
   def __init__(self):
@@ -38,30 +40,18 @@ class VLDFile:
 class VLDHelper:
   @staticmethod
   def export_voxels(voxels):
-    data = bytearray()
-    for pos, info in voxels.blocks.items():
-      x, y, z = pos
-      size = info['size']
-      color = [1.0, 1.0, 1.0]
-      for b in voxels.batches:
-        if b is None:
-          continue
-        if pos in voxels.blocks and voxels.blocks[pos]['block_id'] == voxels.batches.index(b):
-          v = b['vertices']
-          if len(v) >= 9:
-            color = v[6:9]
-          break
-      data.extend(struct.pack('<3iI3f', x, y, z, size, *color))
-    return bytes(data)
+    ids = voxels.batches.live_ids()
+    entries = np.zeros(len(ids), dtype=VOXEL_ENTRY_DTYPE)
+    entries['position'] = voxels.batches.positions[ids]
+    entries['size'] = voxels.batches.sizes[ids]
+    entries['color'] = np.array(voxels.palette, dtype=np.float32).reshape(-1, 3)[voxels.batches.colors[ids]]
+    return entries.tobytes()
 
   @staticmethod
   def import_voxels(voxels, binary_data):
-    voxels.blocks.clear()
-    voxels.batches.clear()
-    entry_size = struct.calcsize('<3iI3f')
-    for i in range(0, len(binary_data), entry_size):
-      x, y, z, size, r, g, b = struct.unpack('<3iI3f', binary_data[i:i+entry_size])
-      voxels.add_batch((x, y, z), size, [r, g, b])
+    voxels.clear()
+    entries = np.frombuffer(binary_data, dtype=VOXEL_ENTRY_DTYPE)
+    voxels.add_many(entries['position'], entries['size'], entries['color'])
 
   @staticmethod
   def export_grid(grid):
@@ -1,6 +1,98 @@
 import struct
 import os
 import io
+import mmap
+import numpy as np
+
+INDEXED_CHUNKS = {b'SIZE', b'XYZI', b'RGBA', b'nTRN', b'nGRP', b'nSHP'}
+
+def unique_voxels(xyzi):
+  """
+  Drops repeated positions from an (N, 4) uint8 XYZI array, keeping the
+  first occurrence; xyzi is returned unchanged when there are none. Works
+  on the packed 24-bit position keys: chunks written in scan order are
+  strictly increasing and need one comparison pass, others one sort, and
+  only the repeated positions pay for a second sort that carries indices.
+  """
+  keys = np.ascontiguousarray(xyzi).view('<u4').ravel() & 0xFFFFFF
+  if (keys[1:] > keys[:-1]).all():
+    return xyzi
+  ordered = np.sort(keys)
+  same = ordered[1:] == ordered[:-1]
+  if not same.any():
+    return xyzi
+  # Only entries whose key repeats need sorting by index. Keys and indices
+  # share one uint64, so a plain sort orders each run by position in the
+  # chunk and every entry after the first of its run is dropped.
+  repeated = np.zeros(int(ordered[-1]) + 1, dtype=bool)
+  repeated[ordered[1:][same]] = True
+  involved = np.flatnonzero(repeated[keys])
+  order = (keys[involved].astype(np.uint64) << np.uint64(32)) | involved.astype(np.uint64)
+  order.sort()
+  later = np.zeros(len(order), dtype=bool)
+  np.equal(order[1:] >> np.uint64(32), order[:-1] >> np.uint64(32), out=later[1:])
+  keep = np.ones(len(keys), dtype=bool)
+  keep[(order[later] & np.uint64(0xFFFFFFFF)).astype(np.intp)] = False
+  return xyzi[keep]
+
+def parse_rotation(value):
+  """
+  3x3 signed permutation matrix of an nTRN '_r' byte: bits 0-1 and 2-3 hold
+  the column of the non-zero entry in the first and second rows (the third
+  row takes the remaining column) and bits 4, 5, 6 make the rows negative.
+  """
+  rotation = np.eye(3, dtype=np.int64)
+  try:
+    bits = int(value)
+  except (TypeError, ValueError):
+    return rotation
+  first, second = bits & 3, (bits >> 2) & 3
+  if first == second or first > 2 or second > 2:
+    return rotation
+  rotation[:] = 0
+  for row, column in enumerate((first, second, 3 - first - second)):
+    rotation[row, column] = -1 if bits & (16 << row) else 1
+  return rotation
+
+def place_voxels(xyz, size, rotation, translation):
+  """
+  World positions of a model's (N, 3) voxel coordinates. The model is
+  rotated about the center of its size box, which keeps its corner at
+  translation when rotation is the identity. Works in doubled coordinates
+  so that even-sized boxes stay integral; rotation is a signed
+  permutation, so it is applied as a column gather rather than a matmul.
+  """
+  size = np.asarray(size, dtype=np.int64)
+  doubled = 2 * np.asarray(xyz, dtype=np.int64) + 1 - size
+  columns = np.abs(rotation).argmax(axis=1)
+  signs = rotation[np.arange(3), columns]
+  return (doubled[:, columns] * signs + size - 1 + 2 * np.asarray(translation, dtype=np.int64)) // 2
+
+class VOXModels:
+  """
+  Models of a memory-mapped .vox file. A model's XYZI payload is only turned
+  into an array the first time the model is indexed, and that array is a
+  read-only view into the mapping (unless the model has duplicate voxels).
+  """
+  def __init__(self, mapping, entries):
+    self.mapping = mapping
+    self.entries = entries
+    self.decoded = {}
+
+  def __len__(self):
+    return len(self.entries)
+
+  def __getitem__(self, model_id):
+    model = self.decoded.get(model_id)
+    if model is None:
+      size, offset, count = self.entries[model_id]
+      xyzi = np.frombuffer(self.mapping, dtype=np.uint8, count=count * 4, offset=offset).reshape(count, 4)
+      model = self.decoded[model_id] = {'size': size, 'voxels': unique_voxels(xyzi), 'id': model_id}
+    return model
+
+  def __iter__(self):
+    for model_id in range(len(self.entries)):
+      yield self[model_id]
 
 class VOXImporter:
   def __init__(self):
@@ -11,11 +103,20 @@ class VOXImporter:
     self.shapes = {}
     self.groups = {}
     self.has_scene_graph = False
-
-  def load_vox_file(self, filepath):
+    self.mapping = None
+    self.chunk_index = []
+
+  def load_vox_file(self, filepath, mapped=False):
+    """
+    Returns (models, palette). With mapped=True the file is memory-mapped and
+    only indexed up front; models is then a VOXModels that decodes each model
+    on first access.
+    """
     if not os.path.exists(filepath):
       print(f"File {filepath} does not exist")
       return [], []
+    if mapped:
+      return self._map_vox_file(filepath)
 
     with open(filepath, 'rb') as f:
       magic = f.read(4)
@@ -34,6 +135,68 @@ class VOXImporter:
 
     return self.models, self.palette
 
+  def _map_vox_file(self, filepath):
+    with open(filepath, 'rb') as f:
+      if os.fstat(f.fileno()).st_size < 20:
+        print("Not a valid .vox file")
+        return [], []
+      mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapping[:4] != b'VOX ':
+      print("Not a valid .vox file")
+      return [], []
+    if mapping[8:12] != b'MAIN':
+      print("Missing MAIN chunk")
+      return [], []
+    self.mapping = mapping
+    main_content, main_children = struct.unpack_from('<II', mapping, 12)
+    start = 20 + main_content
+    self._index_chunks(start, min(start + main_children, len(mapping)))
+
+    entries = []
+    size = None
+    for chunk_id, offset, content_size in self.chunk_index:
+      if chunk_id == b'SIZE':
+        size = struct.unpack_from('<3I', mapping, offset)
+      elif chunk_id == b'XYZI':
+        count = struct.unpack_from('<I', mapping, offset)[0] if content_size >= 4 else 0
+        if content_size >= 4 and count * 4 <= content_size - 4:
+          entries.append((size or (256, 256, 256), offset + 4, count))
+        size = None
+      else:
+        self._parse_indexed_chunk(chunk_id, io.BytesIO(mapping[offset:offset + content_size]), content_size)
+    self.models = VOXModels(mapping, entries)
+    return self.models, self.palette
+
+  def _index_chunks(self, offset, end):
+    """
+    Records (id, content offset, content size) of every chunk we understand.
+    Child chunks directly follow their parent's content, so one linear scan
+    over the headers visits the whole tree without reading any payload.
+    """
+    self.chunk_index = []
+    while offset + 12 <= end:
+      chunk_id = self.mapping[offset:offset + 4]
+      content_size = struct.unpack_from('<I', self.mapping, offset + 4)[0]
+      offset += 12
+      if offset + content_size > end:
+        break
+      if chunk_id in INDEXED_CHUNKS:
+        self.chunk_index.append((chunk_id, offset, content_size))
+      offset += content_size
+
+  def _parse_indexed_chunk(self, chunk_id, f, size):
+    if chunk_id == b'RGBA':
+      self._parse_rgba_chunk(f, size)
+    elif chunk_id == b'nTRN':
+      self.has_scene_graph = True
+      self._parse_ntrn_chunk(f, size)
+    elif chunk_id == b'nGRP':
+      self.has_scene_graph = True
+      self._parse_ngrp_chunk(f, size)
+    elif chunk_id == b'nSHP':
+      self.has_scene_graph = True
+      self._parse_nshp_chunk(f, size)
+
   def _read_chunk(self, f):
     chunk_id = f.read(4)
     if len(chunk_id) < 4:
@@ -59,8 +222,7 @@ class VOXImporter:
       if chunk['id'] == b'SIZE':
         self._parse_size_chunk(f, chunk['content_size'])
       elif chunk['id'] == b'XYZI':
-        xyzi_data = f.read(chunk['content_size'])
-        self._parse_xyzi_chunk(io.BytesIO(xyzi_data), chunk['content_size'])
+        self._parse_xyzi_chunk(f.read(chunk['content_size']))
       elif chunk['id'] == b'RGBA':
         self._parse_rgba_chunk(f, chunk['content_size'])
       elif chunk['id'] == b'nTRN':
@@ -84,41 +246,26 @@ class VOXImporter:
     x, y, z = struct.unpack('<3I', f.read(12))
     self.current_model = {
       'size': (x, y, z),
-      'voxels': [],
+      'voxels': np.empty((0, 4), dtype=np.uint8),
       'id': len(self.models)
     }
 
-  def _parse_xyzi_chunk(self, f, size):
+  def _parse_xyzi_chunk(self, data):
     if self.current_model is None:
       self.current_model = {
         'size': (256, 256, 256),
-        'voxels': [],
+        'voxels': np.empty((0, 4), dtype=np.uint8),
         'id': len(self.models)
       }
 
-    num_voxels_bytes = f.read(4)
-    if len(num_voxels_bytes) < 4:
+    if len(data) < 4:
       return
-
-    num_voxels = struct.unpack('<I', num_voxels_bytes)[0]
-    expected_size = num_voxels * 4
-
-    voxel_data = f.read(expected_size)
-    if len(voxel_data) < expected_size:
+    num_voxels = struct.unpack_from('<I', data)[0]
+    if len(data) - 4 < num_voxels * 4:
       return
 
-    voxels = []
-    positions_in_model = set()
-    
-    for i in range(0, expected_size, 4):
-      x, y, z, color_index = struct.unpack('<4B', voxel_data[i:i+4])
-      pos = (x, y, z)
-      
-      if pos not in positions_in_model:
-        positions_in_model.add(pos)
-        voxels.append((x, y, z, color_index))
-
-    self.current_model['voxels'] = voxels
+    xyzi = np.frombuffer(data, dtype=np.uint8, count=num_voxels * 4, offset=4).reshape(num_voxels, 4)
+    self.current_model['voxels'] = unique_voxels(xyzi)
     self.models.append(self.current_model)
     self.current_model = None
 
@@ -143,7 +290,7 @@ class VOXImporter:
     
     transform = {
       'translation': [0, 0, 0],
-      'rotation': 0
+      'rotation': parse_rotation(frames[0].get('_r') if frames else None)
     }
     
     if frames and '_t' in frames[0]:
@@ -206,31 +353,28 @@ class VOXImporter:
     return f.read(length).decode('utf-8')
 
   def get_model_instances(self):
+    """
+    [{'model_id', 'transform', 'rotation'}] for every placed model, where
+    transform is the accumulated translation and rotation the accumulated
+    3x3 matrix of the nTRN nodes above it.
+    """
     if not self.has_scene_graph:
-      instances = []
-      for i, model in enumerate(self.models):
-        instances.append({
-          'model_id': i,
-          'transform': [0, 0, 0]
-        })
-      return instances
+      return self._untransformed_instances()
     
     instances = []
     processed_shapes = set()
     
-    def collect_transforms(node_id, cumulative_transform=[0, 0, 0]):
+    def collect_transforms(node_id, rotation, translation):
       if node_id in self.transforms:
         trans_data = self.transforms[node_id]
-        new_transform = [
-          cumulative_transform[0] + trans_data['transform']['translation'][0],
-          cumulative_transform[1] + trans_data['transform']['translation'][1],
-          cumulative_transform[2] + trans_data['transform']['translation'][2]
-        ]
-        collect_transforms(trans_data['child_node_id'], new_transform)
+        node = trans_data['transform']
+        collect_transforms(trans_data['child_node_id'],
+                           rotation @ node['rotation'],
+                           translation + rotation @ node['translation'])
       
       elif node_id in self.groups:
         for child_id in self.groups[node_id]['children']:
-          collect_transforms(child_id, cumulative_transform)
+          collect_transforms(child_id, rotation, translation)
       
       elif node_id in self.shapes and node_id not in processed_shapes:
         processed_shapes.add(node_id)
@@ -238,22 +382,26 @@ class VOXImporter:
         for model_info in shape_data['models']:
           instances.append({
             'model_id': model_info['id'],
-            'transform': cumulative_transform[:]
+            'transform': translation.tolist(),
+            'rotation': rotation
           })
     
+    children = {trans['child_node_id'] for trans in self.transforms.values()}
+    for group in self.groups.values():
+      children.update(group['children'])
     for root_id in self.transforms:
-      if not any(trans['child_node_id'] == root_id for trans in self.transforms.values()):
-        collect_transforms(root_id)
+      if root_id not in children:
+        collect_transforms(root_id, np.eye(3, dtype=np.int64), np.zeros(3, dtype=np.int64))
     
     if not instances:
-      for i, model in enumerate(self.models):
-        instances.append({
-          'model_id': i,
-          'transform': [0, 0, 0]
-        })
+      return self._untransformed_instances()
     
     return instances
 
+  def _untransformed_instances(self):
+    return [{'model_id': i, 'transform': [0, 0, 0], 'rotation': np.eye(3, dtype=np.int64)}
+            for i in range(len(self.models))]
+
 class VOXHelper:
   DEFAULT_PALETTE = [
     (1.0, 1.0, 1.0, 1.0),
@@ -263,87 +411,78 @@ class VOXHelper:
     (1.0, 0.0, 0.0, 1.0), (1.0, 0.0, 0.2, 1.0), (1.0, 0.0, 0.4, 1.0),
     (1.0, 0.0, 0.6, 1.0), (1.0, 0.0, 0.8, 1.0), (1.0, 0.0, 1.0, 1.0),
   ] + [(0.5, 0.5, 0.5, 1.0)] * 240
+  
+  IMPORT_BATCH = 1 << 16
 
   @staticmethod
   def import_vox(voxels, filepath, voxel_size=1, center=False, region_size=None):
     importer = VOXImporter()
-    models, palette = importer.load_vox_file(filepath)
+    models, palette = importer.load_vox_file(filepath, mapped=True)
     if not models:
       return
     if not palette:
       palette = VOXHelper.DEFAULT_PALETTE
     
-    model_instances = importer.get_model_instances()
+    model_instances = [i for i in importer.get_model_instances() if i['model_id'] < len(models)]
+    
+    voxels.clear()
     
-    voxels.blocks.clear()
-    voxels.batches.clear()
+    offset = np.zeros(3, dtype=np.int64)
+    if center:
+      bounds = VOXHelper.instance_bounds(models, model_instances)
+      if bounds is not None:
+        offset = -(bounds[0] + bounds[1]) // 2
     
-    global_positions = set()
-    all_world_positions = []
+    color_table = np.ones((256, 3), dtype=np.float64)
+    listed = np.array(palette[:255], dtype=np.float64)[:, :3]
+    color_table[1:len(listed) + 1] = listed
     
+    for instance in model_instances:
+      model = models[instance['model_id']]
+      model_voxels = model['voxels']
+      translation = np.asarray(instance['transform'], dtype=np.int64) + offset
+      for start in range(0, len(model_voxels), VOXHelper.IMPORT_BATCH):
+        batch = model_voxels[start:start + VOXHelper.IMPORT_BATCH]
+        world = place_voxels(batch[:, :3], model['size'], instance['rotation'], translation)
+        positions = world[:, [0, 2, 1]] * voxel_size
+        color_index = batch[:, 3]
+        
+        if region_size is not None:
+          if center:
+            half_region = region_size // 2
+            inside = ((positions >= -half_region) & (positions < half_region)).all(axis=1)
+          else:
+            inside = ((positions >= 0) & (positions < region_size)).all(axis=1)
+          positions = positions[inside]
+          color_index = color_index[inside]
+        
+        voxels.add_many(positions, voxel_size, color_table[color_index])
+
+  @staticmethod
+  def instance_bounds(models, model_instances):
+    """
+    (min, max) corner of all placed voxels, in .vox axes, from each model's
+    voxel extent (computed once per model) placed by each instance's
+    transform. None when no instance has voxels.
+    """
+    extents = {}
+    lows, highs = [], []
     for instance in model_instances:
       model_id = instance['model_id']
-      if model_id >= len(models):
-        continue
-      
-      model = models[model_id]
-      transform = instance['transform']
-      
-      for x, y, z, color_index in model['voxels']:
-        world_x = x + transform[0]
-        world_y = y + transform[1]
-        world_z = z + transform[2]
-        all_world_positions.append((world_x, world_y, world_z, color_index))
-    
-    global_offset_x, global_offset_y, global_offset_z = 0, 0, 0
-    
-    if center and all_world_positions:
-      min_x = min(pos[0] for pos in all_world_positions)
-      max_x = max(pos[0] for pos in all_world_positions)
-      min_y = min(pos[1] for pos in all_world_positions)
-      max_y = max(pos[1] for pos in all_world_positions)
-      min_z = min(pos[2] for pos in all_world_positions)
-      max_z = max(pos[2] for pos in all_world_positions)
-      
-      global_offset_x = -(min_x + max_x) // 2
-      global_offset_y = -(min_y + max_y) // 2
-      global_offset_z = -(min_z + max_z) // 2
-    
-    for world_x, world_y, world_z, color_index in all_world_positions:
-      final_x = world_x + global_offset_x
-      final_y = world_y + global_offset_y
-      final_z = world_z + global_offset_z
-      
-      pos_x = final_x * voxel_size
-      pos_y = final_z * voxel_size
-      pos_z = final_y * voxel_size
-      
-      final_pos = (pos_x, pos_y, pos_z)
-      
-      if final_pos in global_positions:
-        continue
-      global_positions.add(final_pos)
-      
-      if region_size is not None:
-        half_region = region_size // 2
-        if center:
-          if not (-half_region <= pos_x < half_region and 
-                  -half_region <= pos_y < half_region and 
-                  -half_region <= pos_z < half_region):
-            continue
-        else:
-          if not (0 <= pos_x < region_size and 
-                  0 <= pos_y < region_size and 
-                  0 <= pos_z < region_size):
-            continue
-      
-      if color_index > 0 and color_index <= len(palette):
-        color = palette[color_index - 1]
-        rgb_color = [color[0], color[1], color[2]]
-      else:
-        rgb_color = [1.0, 1.0, 1.0]
-      
-      voxels.add_batch(final_pos, voxel_size, rgb_color)
+      if model_id not in extents:
+        model_voxels = models[model_id]['voxels']
+        extents[model_id] = None
+        if len(model_voxels):
+          xyz = model_voxels[:, :3]
+          extents[model_id] = (xyz.min(axis=0).astype(np.int64), xyz.max(axis=0).astype(np.int64))
+      if extents[model_id] is not None:
+        corners = place_voxels(np.array(extents[model_id]), models[model_id]['size'],
+                               instance['rotation'], instance['transform'])
+        lows.append(corners.min(axis=0))
+        highs.append(corners.max(axis=0))
+    if not lows:
+      return None
+    return np.min(lows, axis=0), np.max(highs, axis=0)
 
   @staticmethod
   def get_vox_info(filepath):
@@ -13,6 +13,8 @@ from ui import UI
 from io_565 import Exporter565
 from io_vld import VLDFile, VLDHelper
 from io_vox import VOXHelper
+from frame_stats import FrameStats
+from frame_profiler import FrameProfiler
 
 camera = Camera()
 voxels = None
@@ -21,12 +23,17 @@ grid = None
 cursor = None
 exporter = None
 ui = None
+frame_stats = FrameStats()
+profiler = FrameProfiler()
 
 current_width = 800.0
 current_height = 600.0
 projection = None
 ortho = None
 
+MESH_UPLOAD_BUDGET = 8
+MESH_PROCESSES = None
+
 def world_size_changed(value):
   camera.distance = value
 
@@ -44,6 +51,15 @@ def key_callback(window, key, scancode, action, mods):
   grid.on_key_event(key, action)
   exporter.on_key_event(key, action)
 
+  if key == glfw.KEY_T and action == glfw.RELEASE:
+    frame_stats.toggle()
+
+  if key == glfw.KEY_F3 and action == glfw.RELEASE:
+    ui.show_profiler = not ui.show_profiler
+
+  if key == glfw.KEY_F4 and action == glfw.RELEASE:
+    profiler.dump("frame_profile.json")
+
   """Temporary .vld"""
   if key == glfw.KEY_S and action == glfw.PRESS:
     if glfw.get_key(window, glfw.KEY_LEFT_CONTROL) == glfw.PRESS or \
@@ -134,6 +150,7 @@ def main():
     lambda: print("open"),
     lambda: print("save")
   )
+  ui.set_profiler(profiler)
 
   glfw.set_key_callback(window, key_callback)
   glfw.set_window_size_callback(window, window_size_callback)
@@ -141,6 +158,8 @@ def main():
   grid = Grid()
   overlay = Overlay(current_width, current_height)
   voxels = Voxels()
+  voxels.start_mesh_worker()
+  voxels.enable_mesh_pool(MESH_PROCESSES)
   cursor = TargetCursor(camera)
   cursor.set_grid_size(1)
   cursor.set_cell_size(1.0)
@@ -165,8 +184,11 @@ def main():
   camera.set_movement_speed(10.0)
   camera.set_delays(0.5, 0.25)
   
+  pv = np.empty((4, 4), dtype=np.float32)
   last_time = time.time()
   while not glfw.window_should_close(window):
+    profiler.begin_frame()
+    frame_stats.begin_frame()
     current_time = time.time()
     delta_time = current_time - last_time
     last_time = current_time
@@ -174,22 +196,39 @@ def main():
     glfw.poll_events()
     ui.process_inputs()
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+    profiler.mark('input')
     
     camera.update(delta_time)
+    profiler.mark('camera.update')
     
     view = camera.get_view_matrix()
-    pv = projection @ view
+    np.matmul(projection, view, out=pv)
     
-    voxels.draw(pv)
+    voxels.process_mesh_results(MESH_UPLOAD_BUDGET)
+    voxels.update_buffers()
+    profiler.mark('voxels.update_buffers')
+    voxels.draw(pv, camera.get_position())
+    profiler.mark('voxels.draw')
     grid.draw_grid(pv)
+    profiler.mark('grid.draw_grid')
     cursor.draw(camera.target, pv)
+    profiler.mark('cursor.draw')
     grid.draw(pv)
+    profiler.mark('grid.draw')
     overlay.draw(ortho)
+    profiler.mark('overlay.draw')
+    
+    profiler.set_counter('triangles', voxels.mesh_stats['triangles'])
+    profiler.set_counter('VBO bytes', voxels.mesh_stats['buffer_bytes'])
+    profiler.set_counter('rebuilds', voxels.rebuild_count)
     
     glViewport(0, 0, int(current_width), int(current_height))
     ui.draw()
+    profiler.mark('ui.draw')
         
     glfw.swap_buffers(window)
+    profiler.mark('swap_buffers')
+    frame_stats.end_frame()
   
   cursor.cleanup()
   overlay.cleanup()
@@ -0,0 +1,307 @@
+import numpy as np
+from voxel_store import CHUNK_SIZE
+
+def get_cube_faces(size):
+  half = size * 0.5
+  return [
+    ([-half, -half, -half], [half, -half, -half], [half, half, -half], [-half, half, -half], [0, 0, -1]),
+    ([-half, -half, half], [half, -half, half], [half, half, half], [-half, half, half], [0, 0, 1]),
+    ([-half, -half, -half], [half, -half, -half], [half, -half, half], [-half, -half, half], [0, -1, 0]),
+    ([-half, half, -half], [half, half, -half], [half, half, half], [-half, half, half], [0, 1, 0]),
+    ([half, -half, -half], [half, half, -half], [half, half, half], [half, -half, half], [1, 0, 0]),
+    ([-half, -half, -half], [-half, half, -half], [-half, half, half], [-half, -half, half], [-1, 0, 0]),
+  ]
+
+CUBE_FACE_CORNERS = np.array([face[:4] for face in get_cube_faces(2)], dtype=np.float32)
+CUBE_FACE_NORMALS = np.array([face[4] for face in get_cube_faces(2)], dtype=np.int64)
+QUAD_INDICES = np.array([0, 1, 2, 2, 3, 0], dtype=np.uint32)
+
+def quad_indices(count):
+  return (QUAD_INDICES + 4 * np.arange(count, dtype=np.uint32)[:, None]).ravel()
+
+FACE_INDICES = quad_indices(6)
+
+def build_cube_faces(origins, sizes, colors, visible):
+  batch_index, face_index = np.nonzero(visible)
+  half = (sizes[batch_index] * 0.5).astype(np.float32)[:, None, None]
+  center = origins[batch_index][:, None, :] + half
+  positions = center + CUBE_FACE_CORNERS[face_index] * half
+  normals = np.broadcast_to(CUBE_FACE_NORMALS[face_index][:, None, :], positions.shape)
+  face_colors = np.broadcast_to(colors[batch_index][:, None, :], positions.shape)
+  vertices = np.concatenate([positions, normals, face_colors], axis=2).astype(np.float32).reshape(-1, 9)
+  return vertices, np.count_nonzero(visible, axis=1)
+
+def merge_face_runs(keys):
+  padded = np.zeros((keys.shape[0], keys.shape[1], keys.shape[2] + 2), dtype=keys.dtype)
+  padded[:, :, 1:-1] = keys
+  slices, rows, bounds = np.nonzero(padded[:, :, 1:] != padded[:, :, :-1])
+  same_row = (slices[1:] == slices[:-1]) & (rows[1:] == rows[:-1])
+  slices, rows, starts, ends = slices[:-1][same_row], rows[:-1][same_row], bounds[:-1][same_row], bounds[1:][same_row]
+  run_keys = keys[slices, rows, starts]
+  valid = run_keys != 0
+  slices, rows, starts, ends, run_keys = slices[valid], rows[valid], starts[valid], ends[valid], run_keys[valid]
+
+  order = np.lexsort((rows, run_keys, ends, starts, slices))
+  slices, rows, starts, ends, run_keys = slices[order], rows[order], starts[order], ends[order], run_keys[order]
+  new_rect = np.ones(len(rows), dtype=bool)
+  new_rect[1:] = (
+    (slices[1:] != slices[:-1]) | (starts[1:] != starts[:-1]) | (ends[1:] != ends[:-1]) |
+    (run_keys[1:] != run_keys[:-1]) | (rows[1:] != rows[:-1] + 1)
+  )
+  first = np.flatnonzero(new_rect)
+  last = np.append(first[1:], len(rows)) - 1
+  return slices[first], rows[first], rows[last] + 1, starts[first], ends[first], run_keys[first]
+
+def greedy_mesh_chunk(batch_ids, colors, origin, palette):
+  """
+  batch_ids and colors cover the chunk plus a one-cell border on every
+  side, so faces against neighbouring chunks are culled correctly.
+  """
+  occupied = batch_ids >= 0
+  inner = occupied[1:-1, 1:-1, 1:-1]
+  keys = np.where(inner, colors[1:-1, 1:-1, 1:-1].astype(np.int64) + 1, 0)
+  positions = []
+  normals = []
+  face_colors = []
+  for normal in CUBE_FACE_NORMALS:
+    axis = int(np.flatnonzero(normal)[0])
+    first, second = [a for a in range(3) if a != axis]
+    neighbor = [slice(1, -1)] * 3
+    neighbor[axis] = slice(2, None) if normal[axis] > 0 else slice(0, -2)
+    exposed = inner & ~occupied[tuple(neighbor)]
+    if not exposed.any():
+      continue
+    face_keys = np.transpose(np.where(exposed, keys, 0), (axis, first, second))
+    planes, row0, row1, col0, col1, rect_keys = merge_face_runs(face_keys)
+    corners = np.empty((len(planes), 4, 3), dtype=np.float32)
+    corners[:, :, axis] = (planes + (1 if normal[axis] > 0 else 0))[:, None]
+    corners[:, :, first] = np.stack([row0, row1, row1, row0], axis=1)
+    corners[:, :, second] = np.stack([col0, col0, col1, col1], axis=1)
+    positions.append(corners + np.asarray(origin, dtype=np.float32))
+    normals.append(np.broadcast_to(normal.astype(np.float32), corners.shape))
+    face_colors.append(np.broadcast_to(palette[rect_keys - 1][:, None, :], corners.shape))
+  if not positions:
+    return None
+  vertices = np.concatenate([np.concatenate(positions), np.concatenate(normals), np.concatenate(face_colors)], axis=2)
+  quads = len(vertices)
+  return {
+    'vertices': vertices.reshape(-1, 9).astype(np.float32),
+    'indices': quad_indices(quads)
+  }
+
+def merge_geometry(geometries):
+  geometries = [g for g in geometries if g is not None and len(g['indices'])]
+  if not geometries:
+    return np.empty((0, 9), dtype=np.float32), np.empty(0, dtype=np.uint32)
+  vertex_counts = np.array([len(g['vertices']) for g in geometries], dtype=np.uint32)
+  index_counts = [len(g['indices']) for g in geometries]
+  offsets = np.cumsum(vertex_counts) - vertex_counts
+  vertices = np.concatenate([g['vertices'] for g in geometries])
+  indices = np.concatenate([g['indices'] for g in geometries]) + np.repeat(offsets, index_counts)
+  return vertices, indices
+
+LOD_FACTORS = [1, 2, 4, 8]
+
+def downsample_chunk(batch_ids, colors, factor):
+  """
+  Merges factor^3 blocks into one cell. A coarse cell is occupied when any
+  of its fine cells is, and takes the most common color among them.
+  """
+  n = batch_ids.shape[0] // factor
+  def blocks(a):
+    return a.reshape(n, factor, n, factor, n, factor).transpose(0, 2, 4, 1, 3, 5).reshape(n ** 3, factor ** 3)
+  occupied = blocks(batch_ids >= 0)
+  fine_colors = blocks(colors.astype(np.int64))
+  rows, cells = np.nonzero(occupied)
+  coarse_ids = np.where(occupied.any(axis=1), 0, -1).astype(np.int32)
+  coarse_colors = np.zeros(n ** 3, dtype=np.uint16)
+  if len(rows):
+    stride = int(fine_colors.max()) + 1
+    keys, counts = np.unique(rows * stride + fine_colors[rows, cells], return_counts=True)
+    key_rows = keys // stride
+    order = np.lexsort((-counts, key_rows))
+    first = order[np.r_[True, key_rows[order][1:] != key_rows[order][:-1]]]
+    coarse_colors[key_rows[first]] = keys[first] % stride
+  return coarse_ids.reshape(n, n, n), coarse_colors.reshape(n, n, n)
+
+def build_lod_mesh(store, key, factor, palette, exclude=None):
+  """Greedy mesh of a chunk downsampled by factor, leaving out the cells of the batch ids in exclude."""
+  origin = np.array(key, dtype=np.int64) * CHUNK_SIZE
+  batch_ids, colors = store.read_box(origin - factor, CHUNK_SIZE + 2 * factor)
+  if exclude is not None and len(exclude):
+    batch_ids[np.isin(batch_ids, exclude)] = -1
+  coarse_ids, coarse_colors = downsample_chunk(batch_ids, colors, factor)
+  mesh = greedy_mesh_chunk(coarse_ids, coarse_colors, (0, 0, 0), palette)
+  if mesh is not None:
+    mesh['vertices'][:, :3] = mesh['vertices'][:, :3] * factor + origin
+  return mesh
+
+FACE_SLAB_OFFSETS = {}
+
+def face_slab_offsets(size):
+  offsets = FACE_SLAB_OFFSETS.get(size)
+  if offsets is None:
+    u, v = np.indices((size, size)).reshape(2, -1)
+    faces = []
+    for normal in CUBE_FACE_NORMALS:
+      axis = int(np.flatnonzero(normal)[0])
+      first, second = [a for a in range(3) if a != axis]
+      cells = np.zeros((size * size, 3), dtype=np.int64)
+      cells[:, axis] = size if normal[axis] > 0 else -1
+      cells[:, first] = u
+      cells[:, second] = v
+      faces.append(cells)
+    offsets = FACE_SLAB_OFFSETS[size] = np.stack(faces)
+  return offsets
+
+def face_slab_boxes(position, size):
+  """(origin, dims) of the one-cell slab in front of each face of a batch, in CUBE_FACE_NORMALS order."""
+  boxes = []
+  for normal in CUBE_FACE_NORMALS:
+    axis = int(np.flatnonzero(normal)[0])
+    origin = [int(c) for c in position]
+    dims = [int(size)] * 3
+    origin[axis] += int(size) if normal[axis] > 0 else -1
+    dims[axis] = 1
+    boxes.append((origin, tuple(dims)))
+  return boxes
+
+class CellSnapshot:
+  """
+  Batch ids of a store copied over a few boxes. get_many answers like the
+  store for cells inside them (and -1 elsewhere), so face culling can run
+  on another thread or process while the store keeps changing.
+  """
+  def __init__(self, store, boxes):
+    self.boxes = [
+      (np.asarray(origin, dtype=np.int64), store.read_box(origin, dims)[0])
+      for origin, dims in boxes
+    ]
+
+  def get_many(self, positions):
+    positions = np.asarray(positions, dtype=np.int64).reshape(-1, 3)
+    batch_ids = np.full(len(positions), -1, dtype=np.int32)
+    for origin, cells in self.boxes:
+      local = positions - origin
+      inside = ((local >= 0) & (local < cells.shape)).all(axis=1)
+      local = local[inside]
+      batch_ids[inside] = cells[local[:, 0], local[:, 1], local[:, 2]]
+    return batch_ids
+
+PACKED_VERTEX = np.dtype([
+  ('position', '<i2', 3),
+  ('normal', 'u1'),
+  ('pad', 'u1'),
+  ('color', '<u2'),
+  ('pad2', '<u2')
+])
+NORMAL_CODES = np.array([5, 4, 2, 3, 0, 1], dtype=np.uint8)
+VERTEX_BYTES = {'float': 36, 'packed': PACKED_VERTEX.itemsize}
+
+def pack_vertices(vertices):
+  """
+  Converts (n, 9) float vertices to 12-byte records: int16 position, the
+  normal as an index into CUBE_FACE_NORMALS and the color as RGB565.
+  """
+  positions = np.rint(vertices[:, :3])
+  if len(positions) and (positions.min() < -32768 or positions.max() > 32767):
+    raise ValueError("Packed vertices only cover coordinates in [-32768, 32767]")
+  normals = vertices[:, 3:6]
+  axis = np.abs(normals).argmax(axis=1)
+  positive = normals[np.arange(len(normals)), axis] > 0
+  rgb = np.clip(np.rint(vertices[:, 6:9] * [31, 63, 31]), 0, [31, 63, 31]).astype(np.uint16)
+  packed = np.zeros(len(vertices), dtype=PACKED_VERTEX)
+  packed['position'] = positions
+  packed['normal'] = NORMAL_CODES[axis * 2 + positive]
+  packed['color'] = (rgb[:, 0] << 11) | (rgb[:, 1] << 5) | rgb[:, 2]
+  return packed.view(np.uint8).reshape(len(vertices), PACKED_VERTEX.itemsize)
+
+def encode_vertices(vertices, vertex_format):
+  if vertex_format == 'packed':
+    return pack_vertices(vertices)
+  return np.ascontiguousarray(vertices, dtype=np.float32)
+
+def vertex_bounds(vertices):
+  positions = vertices[:, :3]
+  return positions.min(axis=0), positions.max(axis=0)
+
+def prepare_upload(geometries, vertex_format):
+  vertices, indices = merge_geometry(geometries)
+  if not len(indices):
+    return None
+  return encode_vertices(vertices, vertex_format), indices, vertex_bounds(vertices)
+
+def read_chunk(store, key):
+  """
+  Copies a chunk plus a one-cell border as uint16: 0 for empty cells,
+  palette index + 1 otherwise. That is all greedy meshing needs, and the
+  copy can be handed to another thread or process.
+  """
+  origin = [c * CHUNK_SIZE for c in key]
+  batch_ids, colors = store.read_box([c - 1 for c in origin], CHUNK_SIZE + 2)
+  return np.where(batch_ids >= 0, colors + 1, 0).astype(np.uint16)
+
+def mesh_chunk_cells(key, cells, palette):
+  ids = cells.astype(np.int32) - 1
+  return greedy_mesh_chunk(ids, ids, [c * CHUNK_SIZE for c in key], palette)
+
+def mesh_chunk(store, key, palette):
+  return mesh_chunk_cells(key, read_chunk(store, key), palette)
+
+def mesh_store(store, palette, keys=None):
+  """Greedy meshes of every chunk of a store (or only keys), leaving out empty ones."""
+  if keys is None:
+    keys = store.chunk_keys(CHUNK_SIZE)
+  palette = np.asarray(palette, dtype=np.float32).reshape(-1, 3)
+  meshes = {}
+  for key in keys:
+    mesh = mesh_chunk(store, key, palette)
+    if mesh is not None:
+      meshes[key] = mesh
+  return meshes
+
+def face_owners(store, positions, sizes):
+  """
+  Yields, per group of equal-sized batches, the group's indices and the
+  batch ids in the one-cell slab in front of each of their six faces,
+  shaped (group, 6, size * size).
+  """
+  for size in np.unique(sizes).tolist():
+    group = np.flatnonzero(sizes == size)
+    cells = positions[group].astype(np.int64)[:, None, None, :] + face_slab_offsets(size)[None]
+    owners = store.get_many(cells.reshape(-1, 3)).reshape(len(group), 6, size * size)
+    yield group, owners
+
+def exposed_faces(owners):
+  exposed = (owners < 0).any(axis=2)
+  return (exposed << np.arange(6)).sum(axis=1).astype(np.uint8)
+
+def batch_faces(positions, sizes, colors, face_masks):
+  """Faces of cube batches selected by face_masks; returns vertices and the face count of each batch."""
+  visible = (face_masks[:, None] >> np.arange(6)) & 1 > 0
+  return build_cube_faces(positions.astype(np.int64), sizes.astype(np.int64), colors, visible)
+
+def mesh_batches(store, positions, sizes, colors):
+  """Per-face mesh of whole batches, culling faces covered by other voxels in store."""
+  positions = np.asarray(positions, dtype=np.int64).reshape(-1, 3)
+  sizes = np.broadcast_to(np.asarray(sizes, dtype=np.int64), len(positions))
+  masks = np.zeros(len(positions), dtype=np.uint8)
+  for group, owners in face_owners(store, positions, sizes):
+    masks[group] = exposed_faces(owners)
+  vertices, face_counts = batch_faces(positions, sizes, np.asarray(colors, dtype=np.float32), masks)
+  return vertices, quad_indices(int(face_counts.sum()))
+
+def mesh_faces(voxel_ids, cells, positions, sizes, colors, vertex_format):
+  """
+  Culls and meshes the batches of one chunk against a CellSnapshot. Returns
+  voxel_ids, their face masks and the chunk's upload as prepare_upload
+  gives it (None when no face is visible).
+  """
+  masks = np.zeros(len(positions), dtype=np.uint8)
+  for group, owners in face_owners(cells, positions, sizes):
+    masks[group] = exposed_faces(owners)
+  vertices, face_counts = batch_faces(positions, sizes, colors, masks)
+  if not len(vertices):
+    return voxel_ids, masks, None
+  upload = encode_vertices(vertices, vertex_format), quad_indices(int(face_counts.sum())), vertex_bounds(vertices)
+  return voxel_ids, masks, upload
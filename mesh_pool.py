@@ -0,0 +1,90 @@
+import os
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from mesh_builder import mesh_chunk_cells, mesh_faces, read_chunk
+
+def _write_shared(arrays):
+  """Copies arrays into one new shared memory block; returns its name and their layout."""
+  block = shared_memory.SharedMemory(create=True, size=max(sum(a.nbytes for a in arrays), 1))
+  offset = 0
+  layout = []
+  for array in arrays:
+    block.buf[offset:offset + array.nbytes] = array.tobytes()
+    layout.append((array.dtype.str, array.shape))
+    offset += array.nbytes
+  block.close()
+  return block.name, layout
+
+def _read_shared(name, layout):
+  block = shared_memory.SharedMemory(name=name)
+  arrays = []
+  try:
+    offset = 0
+    for dtype, shape in layout:
+      count = int(np.prod(shape))
+      arrays.append(np.frombuffer(block.buf, dtype=dtype, count=count, offset=offset).reshape(shape).copy())
+      offset += arrays[-1].nbytes
+  finally:
+    block.close()
+    block.unlink()
+  return arrays
+
+def _mesh_to_shared_memory(task):
+  key, cells, palette = task
+  mesh = mesh_chunk_cells(key, cells, palette)
+  if mesh is None:
+    return key, None
+  return key, _write_shared([mesh['vertices'], mesh['indices']])
+
+def _faces_to_shared_memory(task):
+  key, args = task
+  voxel_ids, masks, upload = mesh_faces(*args)
+  if upload is None:
+    return key, (voxel_ids, masks, None)
+  vertices, indices, bounds = upload
+  return key, (voxel_ids, masks, (_write_shared([vertices, indices]), bounds))
+
+class MeshPool:
+  """
+  Meshes many chunks at once in worker processes, for full rebuilds such as
+  after loading a file: greedy chunks from a compact copy of their cells,
+  or faces-mode chunks from the mesh_faces arguments. The vertices and
+  indices come back through one shared memory block per chunk.
+  """
+  def __init__(self, workers=None, chunks_per_task=4):
+    self.workers = workers or os.cpu_count() or 1
+    self.chunks_per_task = chunks_per_task
+    self.pool = multiprocessing.get_context('spawn').Pool(self.workers)
+
+  def snapshot(self, store, keys, palette):
+    return [(key, read_chunk(store, key), palette) for key in keys]
+
+  def mesh_chunks(self, tasks):
+    """tasks is a list of (key, cells, palette); returns {key: mesh or None}."""
+    meshes = {}
+    for key, shared in self.pool.imap_unordered(_mesh_to_shared_memory, tasks, self.chunks_per_task):
+      if shared is None:
+        meshes[key] = None
+      else:
+        vertices, indices = _read_shared(*shared)
+        meshes[key] = {'vertices': vertices, 'indices': indices}
+    return meshes
+
+  def mesh_faces(self, tasks):
+    """
+    tasks is a list of (key, mesh_faces arguments); returns {key: what
+    mesh_faces returns for them}.
+    """
+    results = {}
+    for key, (voxel_ids, masks, shared) in self.pool.imap_unordered(_faces_to_shared_memory, tasks, self.chunks_per_task):
+      upload = None
+      if shared is not None:
+        block, bounds = shared
+        upload = (*_read_shared(*block), bounds)
+      results[key] = voxel_ids, masks, upload
+    return results
+
+  def close(self):
+    self.pool.close()
+    self.pool.join()
@@ -0,0 +1,69 @@
+import queue
+import threading
+import traceback
+
+class MeshWorker:
+  """
+  Runs mesh builds on a background thread. Jobs only receive snapshots
+  (plain NumPy arrays), never the live store, and results are posted back
+  to a queue that the render thread drains with drain().
+
+  Every submit() gives its key a new version; a result is only handed out
+  if no newer job for the same key was submitted in the meantime, so the
+  caller keeps showing its previous mesh until the latest one is ready.
+  """
+  def __init__(self):
+    self.jobs = queue.Queue()
+    self.results = queue.Queue()
+    self.versions = {}
+    self.serial = 0
+    self.thread = threading.Thread(target=self._run, name="mesh-worker", daemon=True)
+    self.thread.start()
+
+  @property
+  def pending(self):
+    return len(self.versions)
+
+  def submit(self, key, build, *args):
+    self.serial += 1
+    self.versions[key] = self.serial
+    self.jobs.put((key, self.serial, build, args))
+
+  def reset(self):
+    """Forgets every outstanding job; their results will be discarded."""
+    self.versions.clear()
+
+  def _run(self):
+    while True:
+      job = self.jobs.get()
+      if job is None:
+        return
+      key, version, build, args = job
+      if self.versions.get(key) != version:
+        continue
+      try:
+        result = build(*args)
+      except Exception:
+        print(f"Mesh job for {key} failed:")
+        traceback.print_exc()
+        result = None
+      self.results.put((key, version, result))
+
+  def drain(self, budget):
+    """Returns up to budget (key, result) pairs that are still current."""
+    ready = []
+    while len(ready) < budget:
+      try:
+        key, version, result = self.results.get_nowait()
+      except queue.Empty:
+        break
+      if self.versions.get(key) != version:
+        continue
+      del self.versions[key]
+      ready.append((key, result))
+    return ready
+
+  def stop(self):
+    self.reset()
+    self.jobs.put(None)
+    self.thread.join()
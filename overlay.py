@@ -23,6 +23,22 @@ void main() {
 }
 """
 
+OVERLAY_OFFSET = np.array([50.0, 50.0, 0.0], dtype=np.float32)
+OVERLAY_ROTATE_Y = np.array([
+  [np.cos(np.pi/4), 0, np.sin(np.pi/4), 0],
+  [0, 1, 0, 0],
+  [-np.sin(np.pi/4), 0, np.cos(np.pi/4), 0],
+  [0, 0, 0, 1]
+], dtype=np.float32)
+OVERLAY_ROTATE_Z = np.array([
+  [np.cos(np.pi/4), -np.sin(np.pi/4), 0, 0],
+  [np.sin(np.pi/4),  np.cos(np.pi/4), 0, 0],
+  [0, 0, 1, 0],
+  [0, 0, 0, 1]
+], dtype=np.float32)
+OVERLAY_SCALE = np.diag([30.0, 30.0, 30.0, 1.0]).astype(np.float32)
+OVERLAY_ROTATE_SCALE = OVERLAY_ROTATE_Y @ OVERLAY_ROTATE_Z @ OVERLAY_SCALE
+
 class Overlay:
   def __init__(self, width, height):
     self.colors = [
@@ -43,10 +59,23 @@ class Overlay:
     self.color = self.colors[self.color_index]
 
     self.shader_program = self.create_shader()
+    self.mvp_location = glGetUniformLocation(self.shader_program, "mvp")
+    self.color_location = glGetUniformLocation(self.shader_program, "color")
     self.vao = self.create_cube_vao()
-    
+
+    self.model = OVERLAY_ROTATE_SCALE.copy()
+    self.mvp = np.empty((4, 4), dtype=np.float32)
     self.translation = [-float(width) * 0.5, - float(height) * 0.5, 0.0]
 
+  @property
+  def translation(self):
+    return self._translation
+
+  @translation.setter
+  def translation(self, value):
+    self._translation = value
+    self.model[:3, 3] = np.asarray(value, dtype=np.float32) + OVERLAY_OFFSET
+
   def create_shader(self):
     def compile_shader(source, shader_type):
       shader = glCreateShader(shader_type)
@@ -111,32 +140,9 @@ class Overlay:
     glUseProgram(self.shader_program)
     glDisable(GL_DEPTH_TEST)
 
-    translate = np.eye(4, dtype=np.float32)
-    translate[:3, 3] = self.translation + np.array([50.0, 50.0, 0.0], dtype=np.float32)
-
-    scale = np.diag([30.0, 30.0, 30.0, 1.0]).astype(np.float32)
-    
-    rot_y = np.array([
-      [np.cos(np.pi/4), 0, np.sin(np.pi/4), 0],
-      [0, 1, 0, 0],
-      [-np.sin(np.pi/4), 0, np.cos(np.pi/4), 0],
-      [0, 0, 0, 1]
-    ], dtype=np.float32)
-
-    rot_z = np.array([
-      [np.cos(np.pi/4), -np.sin(np.pi/4), 0, 0],
-      [np.sin(np.pi/4),  np.cos(np.pi/4), 0, 0],
-      [0, 0, 1, 0],
-      [0, 0, 0, 1]
-    ], dtype=np.float32)
-
-    view = np.eye(4, dtype=np.float32)
-
-    model = translate @ rot_y @ rot_z @ scale
-    mvp = projection @ model
-
-    glUniformMatrix4fv(glGetUniformLocation(self.shader_program, "mvp"), 1, GL_FALSE, mvp.T)
-    glUniform3fv(glGetUniformLocation(self.shader_program, "color"), 1, self.color)
+    np.matmul(projection, self.model, out=self.mvp)
+    glUniformMatrix4fv(self.mvp_location, 1, GL_TRUE, self.mvp)
+    glUniform3f(self.color_location, *self.color)
 
     glBindVertexArray(self.vao)
     glDrawElements(GL_TRIANGLES, 36, GL_UNSIGNED_INT, None)
@@ -1,19 +1,38 @@
 import numpy as np
 from OpenGL.GL import *
+import ctypes
+
+CUBE_CORNERS = np.array([
+  [0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+  [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]
+], dtype=np.float32)
+
+CUBE_EDGES = np.array([
+  0, 1, 1, 2, 2, 3, 3, 0,
+  4, 5, 5, 6, 6, 7, 7, 4,
+  0, 4, 1, 5, 2, 6, 3, 7
+], dtype=np.uint32)
 
 class TargetCursor:
   def __init__(self, camera):
     self.camera = camera
     
-    self.VAO = None
-    self.VBO = None
-    self.EBO = None
+    self.grid_VAO = None
+    self.grid_VBO = None
+    self.grid_EBO = None
+    self.center_VAO = None
+    self.center_VBO = None
+    self.center_EBO = None
     self.shader_program = None
     self.mvp_location = None
     self.color_location = None
 
     self.grid_level = 0
     self.cell_size = 1.0
+    self.geometry_cache = {}
+    self.uploaded_key = None
+    self.model = np.eye(4, dtype=np.float32)
+    self.mvp = np.empty((4, 4), dtype=np.float32)
     
     self._setup_shader()
     self._setup_buffers()
@@ -67,81 +86,62 @@ class TargetCursor:
     grid_sizes = [1, 3, 5, 7, 9]
     grid_size = grid_sizes[self.grid_level]
     
-    vertices = []
-    indices = []
-    
     offset = (grid_size - 1) * self.cell_size * 0.5
     center_index = grid_size // 2
-    padding = 0.0
-    
-    for i in range(grid_size):
-      for j in range(grid_size):
-        for k in range(grid_size):
-          if i == center_index and j == center_index and k == center_index:
-            continue
-          
-          x = i * self.cell_size - offset - self.cell_size * 0.5
-          y = j * self.cell_size - offset - self.cell_size * 0.5
-          z = k * self.cell_size - offset - self.cell_size * 0.5
-          
-          cell_size_padded = self.cell_size - 2 * padding
-          
-          cell_vertices = [
-            [x + padding, y + padding, z + padding],
-            [x + padding + cell_size_padded, y + padding, z + padding],
-            [x + padding + cell_size_padded, y + padding + cell_size_padded, z + padding],
-            [x + padding, y + padding + cell_size_padded, z + padding],
-            [x + padding, y + padding, z + padding + cell_size_padded],
-            [x + padding + cell_size_padded, y + padding, z + padding + cell_size_padded],
-            [x + padding + cell_size_padded, y + padding + cell_size_padded, z + padding + cell_size_padded],
-            [x + padding, y + padding + cell_size_padded, z + padding + cell_size_padded]
-          ]
-          
-          base_index = len(vertices)
-          vertices.extend(cell_vertices)
-          
-          cell_indices = [
-            base_index, base_index + 1,
-            base_index + 1, base_index + 2,
-            base_index + 2, base_index + 3,
-            base_index + 3, base_index,
-            base_index + 4, base_index + 5,
-            base_index + 5, base_index + 6,
-            base_index + 6, base_index + 7,
-            base_index + 7, base_index + 4,
-            base_index, base_index + 4,
-            base_index + 1, base_index + 5,
-            base_index + 2, base_index + 6,
-            base_index + 3, base_index + 7
-          ]
-          indices.extend(cell_indices)
-    
-    return np.array(vertices, dtype=np.float32), np.array(indices, dtype=np.uint32)
-  
-  def _setup_buffers(self):
-    self.VAO = glGenVertexArrays(1)
-    self.VBO = glGenBuffers(1)
-    self.EBO = glGenBuffers(1)
-    
-    self._update_buffers()
-  
-  def _update_buffers(self):
-    vertices, indices = self._generate_grid_wireframe()
     
-    glBindVertexArray(self.VAO)
+    cells = np.indices((grid_size, grid_size, grid_size)).reshape(3, -1).T
+    cells = cells[(cells != center_index).any(axis=1)]
+    origins = cells * self.cell_size - offset - self.cell_size * 0.5
     
-    glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
-    glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_DYNAMIC_DRAW)
-    
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.EBO)
-    glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_DYNAMIC_DRAW)
+    vertices = origins[:, None, :] + CUBE_CORNERS[None, :, :] * self.cell_size
+    indices = CUBE_EDGES[None, :] + 8 * np.arange(len(cells), dtype=np.uint32)[:, None]
     
+    return vertices.reshape(-1, 3).astype(np.float32), indices.ravel()
+  
+  def _generate_center_cube(self):
+    half_size = self.cell_size * 0.5
+    vertices = (CUBE_CORNERS * self.cell_size - half_size).astype(np.float32)
+    return vertices, CUBE_EDGES.copy()
+  
+  def _create_vao(self):
+    vao = glGenVertexArrays(1)
+    vbo = glGenBuffers(1)
+    ebo = glGenBuffers(1)
+    glBindVertexArray(vao)
+    glBindBuffer(GL_ARRAY_BUFFER, vbo)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ebo)
     glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 3 * 4, ctypes.c_void_p(0))
     glEnableVertexAttribArray(0)
-    
-    self.indices_count = len(indices)
-    
     glBindVertexArray(0)
+    return vao, vbo, ebo
+  
+  def _setup_buffers(self):
+    self.grid_VAO, self.grid_VBO, self.grid_EBO = self._create_vao()
+    self.center_VAO, self.center_VBO, self.center_EBO = self._create_vao()
+    self._update_buffers()
+  
+  def _upload(self, vao, vbo, vertices, indices):
+    glBindVertexArray(vao)
+    glBindBuffer(GL_ARRAY_BUFFER, vbo)
+    glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+    glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+    glBindVertexArray(0)
+  
+  def _update_buffers(self):
+    key = (self.grid_level, self.cell_size)
+    if key == self.uploaded_key:
+      return
+    geometry = self.geometry_cache.get(key)
+    if geometry is None:
+      geometry = self.geometry_cache[key] = (self._generate_grid_wireframe(), self._generate_center_cube())
+    (grid_vertices, grid_indices), (center_vertices, center_indices) = geometry
+    
+    self._upload(self.grid_VAO, self.grid_VBO, grid_vertices, grid_indices)
+    self._upload(self.center_VAO, self.center_VBO, center_vertices, center_indices)
+    
+    self.indices_count = len(grid_indices)
+    self.center_indices_count = len(center_indices)
+    self.uploaded_key = key
   
   def set_grid_size(self, level):
     if 0 <= level <= 4:
@@ -154,72 +154,33 @@ class TargetCursor:
       self._update_buffers()
   
   def draw(self, target, pvm_matrix):
-    model = np.eye(4, dtype=np.float32)
-    model[0, 3] = target[0]
-    model[1, 3] = target[1]
-    model[2, 3] = target[2]
-    
-    final_mvp = pvm_matrix @ model
+    self._update_buffers()
+    self.model[:3, 3] = target[:3]
+    np.matmul(pvm_matrix, self.model, out=self.mvp)
     
     glUseProgram(self.shader_program)
-    
-    glUniformMatrix4fv(self.mvp_location, 1, GL_FALSE, final_mvp.T)
+    glUniformMatrix4fv(self.mvp_location, 1, GL_TRUE, self.mvp)
     
     glUniform3f(self.color_location, 0.26, 0.4, 0.4)
-    glBindVertexArray(self.VAO)
+    glBindVertexArray(self.grid_VAO)
     glDrawElements(GL_LINES, self.indices_count, GL_UNSIGNED_INT, None)
     
     glDisable(GL_DEPTH_TEST)
-    
-    center_vertices, center_indices = self._generate_center_cube()
-    
-    glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
-    glBufferData(GL_ARRAY_BUFFER, center_vertices.nbytes, center_vertices, GL_DYNAMIC_DRAW)
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.EBO)
-    glBufferData(GL_ELEMENT_ARRAY_BUFFER, center_indices.nbytes, center_indices, GL_DYNAMIC_DRAW)
-    
     if self.camera.is_moving:
       glUniform3f(self.color_location, 0.8, 0.25, 0.3)
     else:
       glUniform3f(self.color_location, 1.0, 0.3, 0.3)
-  
-    glDrawElements(GL_LINES, len(center_indices), GL_UNSIGNED_INT, None)
+    glBindVertexArray(self.center_VAO)
+    glDrawElements(GL_LINES, self.center_indices_count, GL_UNSIGNED_INT, None)
     glEnable(GL_DEPTH_TEST)
     
-    self._update_buffers()
-    
     glBindVertexArray(0)
     glUseProgram(0)
   
-  def _generate_center_cube(self):
-    padding = 0.0
-    half_size = (self.cell_size - 2 * padding) * 0.5
-    
-    vertices = np.array([
-      [-half_size, -half_size, -half_size],
-      [half_size, -half_size, -half_size],
-      [half_size, half_size, -half_size],
-      [-half_size, half_size, -half_size],
-      [-half_size, -half_size, half_size],
-      [half_size, -half_size, half_size],
-      [half_size, half_size, half_size],
-      [-half_size, half_size, half_size]
-    ], dtype=np.float32)
-    
-    indices = np.array([
-      0, 1, 1, 2, 2, 3, 3, 0,
-      4, 5, 5, 6, 6, 7, 7, 4,
-      0, 4, 1, 5, 2, 6, 3, 7
-    ], dtype=np.uint32)
-    
-    return vertices, indices
-  
   def cleanup(self):
-    if self.VAO:
-      glDeleteVertexArrays(1, [self.VAO])
-    if self.VBO:
-      glDeleteBuffers(1, [self.VBO])
-    if self.EBO:
-      glDeleteBuffers(1, [self.EBO])
+    if self.grid_VAO:
+      glDeleteVertexArrays(2, [self.grid_VAO, self.center_VAO])
+    if self.grid_VBO:
+      glDeleteBuffers(4, [self.grid_VBO, self.grid_EBO, self.center_VBO, self.center_EBO])
     if self.shader_program:
       glDeleteProgram(self.shader_program)
@@ -0,0 +1,52 @@
+import numpy as np
+
+from voxels import Voxels
+
+
+def occupancy(voxels):
+  live = voxels.batches.live_ids()
+  return sorted(
+    (tuple(voxels.batches.positions[i].tolist()), int(voxels.batches.sizes[i]), tuple(voxels.palette[voxels.batches.colors[i]]))
+    for i in live
+  )
+
+
+def assert_matches_add_batch(origins, sizes, colors):
+  bulk = Voxels()
+  bulk.add_many(origins, sizes, colors)
+  sequential = Voxels()
+  for origin, size, color in zip(origins, sizes, colors):
+    sequential.add_batch(tuple(origin), size, tuple(color))
+  assert occupancy(bulk) == occupancy(sequential)
+  for i in bulk.batches.live_ids():
+    origin = bulk.batches.positions[i]
+    assert bulk.voxels.get_many(origin[None]).tolist() == [i]
+
+
+def test_overlap_chain_matches_add_batch():
+  # A contains B and B overlaps C, but C stays clear of A: B never lands, so C must.
+  origins = [(0, 0, 0), (2, 2, 2), (3, 3, 4)]
+  sizes = [4, 2, 2]
+  colors = [(1, 0, 0), (0, 1, 0), (0, 0, 1)]
+  assert_matches_add_batch(origins, sizes, colors)
+  bulk = Voxels()
+  assert len(bulk.add_many(origins, sizes, colors)) == 2
+
+
+def test_overlap_order_across_sizes():
+  # The larger entry comes first, so it claims the shared cell before the small one.
+  origins = [(0, 0, 0), (4, 4, 4), (5, 5, 5), (6, 6, 7)]
+  sizes = [2, 2, 1, 1]
+  colors = [(1, 0, 0), (0, 0, 1), (0, 1, 0), (1, 1, 0)]
+  assert_matches_add_batch(origins, sizes, colors)
+  bulk = Voxels()
+  bulk.add_many(origins, sizes, colors)
+  assert occupancy(bulk) == [((0, 0, 0), 2, (1, 0, 0)), ((4, 4, 4), 2, (0, 0, 1)), ((6, 6, 7), 1, (1, 1, 0))]
+
+
+def test_disjoint_entries_all_land():
+  rng = np.random.default_rng(3)
+  origins = np.unique(rng.integers(0, 40, (500, 3)) * 2, axis=0)
+  bulk = Voxels()
+  added = bulk.add_many(origins, 2, np.ones((len(origins), 3)))
+  assert len(added) == len(origins)
@@ -0,0 +1,90 @@
+import re
+import time
+
+import glfw
+import numpy as np
+import pytest
+
+import voxels
+
+
+class FakeBuffers:
+  def __init__(self, vertex_format):
+    self.vertex_count = 0
+    self.index_count = 0
+    self.nbytes = 0
+    self.bounds = (np.zeros(3), np.zeros(3))
+
+  def upload(self, vertices, indices, bounds):
+    self.vertex_count = len(vertices)
+    self.index_count = len(indices)
+    self.nbytes = vertices.nbytes + indices.nbytes
+    self.bounds = bounds
+
+  def draw(self):
+    pass
+
+  def delete(self):
+    pass
+
+
+@pytest.fixture
+def scene(monkeypatch):
+  monkeypatch.setattr(voxels, 'ChunkBuffers', FakeBuffers)
+  scene = voxels.Voxels()
+  scene.start_mesh_worker()
+  rng = np.random.default_rng(0)
+  positions = rng.integers(0, 96, (2000, 3))
+  scene.add_many(positions, 1, rng.integers(0, 2, (2000, 3)))
+  scene.add_batch((40, 40, 40), 16, (1, 0, 0))
+  yield scene
+  scene.cleanup()
+
+
+def settle(scene):
+  """Runs frames the way main.py does until the worker has nothing left."""
+  scene.update_buffers()
+  deadline = time.monotonic() + 30
+  while scene.meshing() or scene.needs_update:
+    assert time.monotonic() < deadline, "mesh worker did not finish"
+    scene.process_mesh_results(8)
+    scene.update_buffers()
+    time.sleep(0.001)
+
+
+def press(scene, key):
+  scene.on_key_event(key, glfw.RELEASE, None, None)
+
+
+def test_mesh_mode_report_counts_worker_meshes(scene, capsys):
+  settle(scene)
+  press(scene, glfw.KEY_G)
+  assert capsys.readouterr().out == ''
+  settle(scene)
+  report = capsys.readouterr().out
+  assert report.startswith("Mesh mode 'greedy'")
+  vertices, face_vertices = map(int, re.findall(r'(\d+) vertices \(per-face: (\d+)\)', report)[0])
+  assert vertices > 0 and face_vertices > 0
+  assert vertices == sum(b.vertex_count for b in scene.chunk_buffers.values())
+
+
+def test_vertex_format_report_counts_worker_buffers(scene, capsys):
+  settle(scene)
+  float_bytes = scene.mesh_stats['buffer_bytes']
+  press(scene, glfw.KEY_K)
+  settle(scene)
+  report = capsys.readouterr().out
+  assert report.startswith("Vertex format 'packed'")
+  packed_bytes = int(re.findall(r'(\d+) bytes', report)[0])
+  assert 0 < packed_bytes < float_bytes
+
+
+def test_faces_jobs_match_inline_meshing(scene):
+  settle(scene)
+  reference = voxels.Voxels()
+  live = scene.batches.live_ids()
+  palette = np.array(scene.palette)
+  reference.add_many(scene.batches.positions[live], scene.batches.sizes[live], palette[scene.batches.colors[live]])
+  reference.update_buffers()
+  assert scene.mesh_stats['vertices'] == reference.mesh_stats['vertices'] > 0
+  assert scene.mesh_stats['face_vertices'] == reference.mesh_stats['face_vertices']
@@ -16,12 +16,18 @@ class UI:
     self.open_callback = lambda: print("open")
     self.save_callback = lambda: print("save")
     
+    self.profiler = None
+    self.show_profiler = False
+    
   def set_callbacks(self, open_callback=None, save_callback=None):
     if open_callback:
       self.open_callback = open_callback
     if save_callback:
       self.save_callback = save_callback
     
+  def set_profiler(self, profiler):
+    self.profiler = profiler
+    
   def update_size(self, width, height):
     self.width = width
     self.height = height
@@ -71,7 +77,7 @@ class UI:
                                    imgui.WINDOW_NO_RESIZE | 
                                    imgui.WINDOW_NO_MOVE |
                                    imgui.WINDOW_NO_SCROLLBAR):
-      text = "Status: Ready"
+      text = self._status_text()
       window_width = imgui.get_window_size()[0]
       text_width = imgui.calc_text_size(text)[0]
       imgui.set_cursor_pos_x(window_width - text_width - 10)
@@ -82,8 +88,46 @@ class UI:
     imgui.pop_style_var()
     imgui.pop_style_color()
     
+    if self.profiler is not None and self.show_profiler:
+      self._draw_profiler()
+    
     imgui.render()
     self.renderer.render(imgui.get_draw_data())
     
+  def _status_text(self):
+    frame = self.profiler.summary().get('frame') if self.profiler is not None else None
+    if frame is None:
+      return "Status: Ready"
+    return f"Frame: {frame[0]:.1f} ms (p99 {frame[1]:.1f} ms)"
+    
+  def _draw_profiler(self):
+    imgui.set_next_window_position(8, self.menu_height + 8, imgui.FIRST_USE_EVER)
+    imgui.set_next_window_size(360, 320, imgui.FIRST_USE_EVER)
+    _, self.show_profiler = imgui.begin("Profiler", closable=True)
+    
+    imgui.columns(4, "stages")
+    for label in ("Stage", "p50 ms", "p99 ms", "Last ms"):
+      imgui.text(label)
+      imgui.next_column()
+    imgui.separator()
+    for name, (p50, p99, last) in self.profiler.summary().items():
+      imgui.text(name)
+      imgui.next_column()
+      for value in (p50, p99, last):
+        imgui.text(f"{value:.2f}")
+        imgui.next_column()
+    imgui.columns(1)
+    imgui.separator()
+    
+    for name, value in self.profiler.counters.items():
+      imgui.text(f"{name}: {value:,}")
+    
+    if imgui.button("Dump CSV"):
+      self.profiler.dump("frame_profile.csv")
+    imgui.same_line()
+    if imgui.button("Dump JSON"):
+      self.profiler.dump("frame_profile.json")
+    imgui.end()
+    
   def cleanup(self):
     self.renderer.shutdown()
@@ -0,0 +1,726 @@
+import sys
+import numpy as np
+
+CHUNK_SIZE = 32
+
+PACK_BITS = 21
+PACK_OFFSET = 1 << (PACK_BITS - 1)
+
+def pack_positions(positions):
+  p = np.asarray(positions, dtype=np.int64) + PACK_OFFSET
+  return (p[..., 0] << (2 * PACK_BITS)) | (p[..., 1] << PACK_BITS) | p[..., 2]
+
+def box_chunk_keys(origins, sizes, shift, margin=0):
+  """
+  Keys of the chunks (1 << shift cells wide) touched by cubes at origins
+  with sizes, grown by margin. Cubes inside a single chunk, the usual case,
+  are deduplicated on packed keys; only the rest expand their key ranges.
+  """
+  lo = (origins - margin) >> shift
+  hi = (origins + sizes[:, None] + margin - 1) >> shift
+  single = (lo == hi).all(axis=1)
+  _, first = np.unique(pack_positions(lo[single]), return_index=True)
+  keys = set(map(tuple, lo[single][first].tolist()))
+  for row in np.unique(np.concatenate([lo[~single], hi[~single]], axis=1), axis=0).tolist():
+    keys.update(
+      (x, y, z)
+      for x in range(row[0], row[3] + 1)
+      for y in range(row[1], row[4] + 1)
+      for z in range(row[2], row[5] + 1)
+    )
+  return keys
+
+def box_dims(size):
+  if np.ndim(size) == 0:
+    return (int(size),) * 3
+  return tuple(int(d) for d in size)
+
+class VoxelChunk:
+  __slots__ = ('occupancy', 'batch_ids', 'colors', 'count')
+
+  def __init__(self, size):
+    shape = (size, size, size)
+    self.occupancy = np.zeros(shape, dtype=bool)
+    self.batch_ids = np.full(shape, -1, dtype=np.int32)
+    self.colors = np.zeros(shape, dtype=np.uint16)
+    self.count = 0
+
+  @property
+  def nbytes(self):
+    return self.occupancy.nbytes + self.batch_ids.nbytes + self.colors.nbytes
+
+class ChunkedVoxelStore:
+  """
+  Dense NumPy chunks allocated on first write and released once empty.
+  Each cell holds an occupancy flag, the id of the batch owning it and a
+  palette color index.
+  """
+  def __init__(self, chunk_size=CHUNK_SIZE):
+    if chunk_size <= 0 or chunk_size & (chunk_size - 1):
+      raise ValueError("chunk_size must be a power of two")
+    self.chunk_size = chunk_size
+    self.shift = chunk_size.bit_length() - 1
+    self.mask = chunk_size - 1
+    self.chunks = {}
+
+  def _split(self, pos):
+    x, y, z = int(pos[0]), int(pos[1]), int(pos[2])
+    key = (x >> self.shift, y >> self.shift, z >> self.shift)
+    return key, (x & self.mask, y & self.mask, z & self.mask)
+
+  def __contains__(self, pos):
+    key, local = self._split(pos)
+    chunk = self.chunks.get(key)
+    return chunk is not None and bool(chunk.occupancy[local])
+
+  def __len__(self):
+    return sum(chunk.count for chunk in self.chunks.values())
+
+  def get(self, pos, default=-1):
+    key, local = self._split(pos)
+    chunk = self.chunks.get(key)
+    if chunk is None or not chunk.occupancy[local]:
+      return default
+    return int(chunk.batch_ids[local])
+
+  def get_color(self, pos, default=-1):
+    key, local = self._split(pos)
+    chunk = self.chunks.get(key)
+    if chunk is None or not chunk.occupancy[local]:
+      return default
+    return int(chunk.colors[local])
+
+  def set(self, pos, batch_id, color_index):
+    key, local = self._split(pos)
+    chunk = self.chunks.get(key)
+    if chunk is None:
+      chunk = self.chunks[key] = VoxelChunk(self.chunk_size)
+    if not chunk.occupancy[local]:
+      chunk.occupancy[local] = True
+      chunk.count += 1
+    chunk.batch_ids[local] = batch_id
+    chunk.colors[local] = color_index
+
+  def discard(self, pos):
+    key, local = self._split(pos)
+    chunk = self.chunks.get(key)
+    if chunk is None or not chunk.occupancy[local]:
+      return
+    chunk.occupancy[local] = False
+    chunk.batch_ids[local] = -1
+    chunk.colors[local] = 0
+    chunk.count -= 1
+    if chunk.count == 0:
+      del self.chunks[key]
+
+  def _group_by_chunk(self, positions):
+    keys, inverse = np.unique(positions >> self.shift, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind='stable')
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(keys))).tolist()
+    start = 0
+    for key, stop in zip(map(tuple, keys.tolist()), bounds):
+      index = order[start:stop]
+      local = positions[index] & self.mask
+      yield key, index, (local[:, 0], local[:, 1], local[:, 2])
+      start = stop
+
+  def get_many(self, positions):
+    positions = np.asarray(positions, dtype=np.int64).reshape(-1, 3)
+    batch_ids = np.full(len(positions), -1, dtype=np.int32)
+    if not len(positions):
+      return batch_ids
+    for key, index, local in self._group_by_chunk(positions):
+      chunk = self.chunks.get(key)
+      if chunk is not None:
+        batch_ids[index] = chunk.batch_ids[local]
+    return batch_ids
+
+  def set_many(self, positions, batch_ids, color_indices):
+    positions = np.asarray(positions, dtype=np.int64).reshape(-1, 3)
+    if not len(positions):
+      return
+    batch_ids = np.broadcast_to(np.asarray(batch_ids, dtype=np.int32), len(positions))
+    color_indices = np.broadcast_to(np.asarray(color_indices, dtype=np.uint16), len(positions))
+    for key, index, local in self._group_by_chunk(positions):
+      chunk = self.chunks.get(key)
+      if chunk is None:
+        chunk = self.chunks[key] = VoxelChunk(self.chunk_size)
+      chunk.occupancy[local] = True
+      chunk.batch_ids[local] = batch_ids[index]
+      chunk.colors[local] = color_indices[index]
+      chunk.count = int(np.count_nonzero(chunk.occupancy))
+
+  def _box_chunks(self, origin, size):
+    lo = [int(c) for c in origin]
+    hi = [c + d for c, d in zip(lo, box_dims(size))]
+    cs = self.chunk_size
+    for cx in range(lo[0] >> self.shift, ((hi[0] - 1) >> self.shift) + 1):
+      for cy in range(lo[1] >> self.shift, ((hi[1] - 1) >> self.shift) + 1):
+        for cz in range(lo[2] >> self.shift, ((hi[2] - 1) >> self.shift) + 1):
+          key = (cx, cy, cz)
+          local = []
+          for axis, base in enumerate((cx * cs, cy * cs, cz * cs)):
+            start = max(lo[axis] - base, 0)
+            stop = min(hi[axis] - base, cs)
+            local.append(slice(start, stop))
+          yield key, tuple(local)
+
+  def read_box(self, origin, size):
+    dims = box_dims(size)
+    batch_ids = np.full(dims, -1, dtype=np.int32)
+    colors = np.zeros(dims, dtype=np.uint16)
+    cs = self.chunk_size
+    for key, local in self._box_chunks(origin, dims):
+      chunk = self.chunks.get(key)
+      if chunk is None:
+        continue
+      target = tuple(
+        slice(key[axis] * cs + local[axis].start - int(origin[axis]), key[axis] * cs + local[axis].stop - int(origin[axis]))
+        for axis in range(3)
+      )
+      batch_ids[target] = chunk.batch_ids[local]
+      colors[target] = chunk.colors[local]
+    return batch_ids, colors
+
+  def box_batch_ids(self, origin, size):
+    found = []
+    for key, local in self._box_chunks(origin, size):
+      chunk = self.chunks.get(key)
+      if chunk is not None:
+        ids = chunk.batch_ids[local]
+        found.append(np.unique(ids[ids >= 0]))
+    if not found:
+      return np.empty(0, dtype=np.int32)
+    return np.unique(np.concatenate(found))
+
+  def fill_box(self, origin, size, batch_id, color_index):
+    for key, local in self._box_chunks(origin, size):
+      chunk = self.chunks.get(key)
+      if chunk is None:
+        chunk = self.chunks[key] = VoxelChunk(self.chunk_size)
+      cells = chunk.occupancy[local]
+      chunk.count += cells.size - int(np.count_nonzero(cells))
+      cells[...] = True
+      chunk.batch_ids[local] = batch_id
+      chunk.colors[local] = color_index
+
+  def clear_box(self, origin, size, batch_id=None):
+    for key, local in self._box_chunks(origin, size):
+      chunk = self.chunks.get(key)
+      if chunk is None:
+        continue
+      if batch_id is None:
+        cells = chunk.occupancy[local].copy()
+      else:
+        cells = chunk.batch_ids[local] == batch_id
+      removed = int(np.count_nonzero(cells))
+      if not removed:
+        continue
+      chunk.occupancy[local][cells] = False
+      chunk.batch_ids[local][cells] = -1
+      chunk.colors[local][cells] = 0
+      chunk.count -= removed
+      if chunk.count == 0:
+        del self.chunks[key]
+
+  def clear_batches(self, positions, sizes, batch_ids):
+    """
+    Clears the cells of many batches (cubes at positions with sizes) with
+    one pass over each chunk they touch, instead of one clear_box each.
+    """
+    positions = np.asarray(positions, dtype=np.int64).reshape(-1, 3)
+    if not len(positions):
+      return
+    sizes = np.broadcast_to(np.asarray(sizes, dtype=np.int64), len(positions))
+    batch_ids = np.asarray(batch_ids, dtype=np.int64)
+    # The last entry stays False, for empty cells (-1) and ids past the largest.
+    doomed = np.zeros(int(batch_ids.max()) + 2, dtype=bool)
+    doomed[batch_ids] = True
+    for key in box_chunk_keys(positions, sizes, self.shift):
+      chunk = self.chunks.get(key)
+      if chunk is None:
+        continue
+      cells = doomed[np.minimum(chunk.batch_ids, len(doomed) - 1)]
+      removed = int(np.count_nonzero(cells))
+      if not removed:
+        continue
+      chunk.occupancy[cells] = False
+      chunk.batch_ids[cells] = -1
+      chunk.colors[cells] = 0
+      chunk.count -= removed
+      if chunk.count == 0:
+        del self.chunks[key]
+
+  def chunk_keys(self, chunk_size=CHUNK_SIZE):
+    if chunk_size == self.chunk_size:
+      return set(self.chunks)
+    shift = chunk_size.bit_length() - 1
+    keys = set()
+    for key, chunk in self.chunks.items():
+      cells = np.argwhere(chunk.occupancy) + np.array(key, dtype=np.int64) * self.chunk_size
+      keys.update(map(tuple, np.unique(cells >> shift, axis=0).tolist()))
+    return keys
+
+  def remap(self, mapping):
+    for chunk in self.chunks.values():
+      chunk.batch_ids[chunk.occupancy] = mapping[chunk.batch_ids[chunk.occupancy]]
+
+  def clear(self):
+    self.chunks.clear()
+
+  def occupied(self):
+    positions = []
+    batch_ids = []
+    colors = []
+    for key, chunk in self.chunks.items():
+      local = np.argwhere(chunk.occupancy)
+      positions.append(local + np.array(key, dtype=np.int64) * self.chunk_size)
+      batch_ids.append(chunk.batch_ids[chunk.occupancy])
+      colors.append(chunk.colors[chunk.occupancy])
+    if not positions:
+      return np.empty((0, 3), dtype=np.int64), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.uint16)
+    return np.concatenate(positions), np.concatenate(batch_ids), np.concatenate(colors)
+
+  @property
+  def nbytes(self):
+    return sum(chunk.nbytes for chunk in self.chunks.values())
+
+BRICK_SIZE = 8
+
+class VoxelBrick:
+  __slots__ = ('batch_ids', 'colors', 'count')
+
+  def __init__(self, size, value=None):
+    shape = (size, size, size)
+    if value is None:
+      self.batch_ids = np.full(shape, -1, dtype=np.int32)
+      self.colors = np.zeros(shape, dtype=np.uint16)
+      self.count = 0
+    else:
+      self.batch_ids = np.full(shape, value[0], dtype=np.int32)
+      self.colors = np.full(shape, value[1], dtype=np.uint16)
+      self.count = size * size * size
+
+  def write(self, local, value):
+    was_set = self.batch_ids[local] >= 0
+    if value is None:
+      self.batch_ids[local] = -1
+      self.colors[local] = 0
+      self.count -= int(was_set)
+      return -int(was_set)
+    self.batch_ids[local] = value[0]
+    self.colors[local] = value[1]
+    self.count += int(not was_set)
+    return int(not was_set)
+
+  def uniform_value(self):
+    if self.count == 0:
+      return None
+    if self.count < self.batch_ids.size:
+      return self
+    bid = self.batch_ids.flat[0]
+    color = self.colors.flat[0]
+    if (self.batch_ids == bid).all() and (self.colors == color).all():
+      return (int(bid), int(color))
+    return self
+
+  @property
+  def nbytes(self):
+    return self.batch_ids.nbytes + self.colors.nbytes
+
+class SparseVoxelStore:
+  """
+  Octree whose nodes are either empty (None), uniform ((batch_id, color)
+  tuples), eight children (list) or, at the bottom level, a dense brick.
+  Uniform and empty regions collapse to a single node, so memory follows
+  surface complexity instead of volume and lookups cost O(depth).
+  """
+  def __init__(self, brick_size=BRICK_SIZE):
+    if brick_size <= 0 or brick_size & (brick_size - 1):
+      raise ValueError("brick_size must be a power of two")
+    self.brick_size = brick_size
+    self.clear()
+
+  def clear(self):
+    self.root = None
+    self.root_origin = (0, 0, 0)
+    self.root_size = self.brick_size
+    self.count = 0
+
+  def __len__(self):
+    return self.count
+
+  def __contains__(self, pos):
+    return self._lookup(pos) is not None
+
+  def _inside(self, x, y, z):
+    ox, oy, oz = self.root_origin
+    size = self.root_size
+    return ox <= x < ox + size and oy <= y < oy + size and oz <= z < oz + size
+
+  def _grow_to(self, x, y, z):
+    while not self._inside(x, y, z):
+      ox, oy, oz = self.root_origin
+      size = self.root_size
+      index = 0
+      if x < ox:
+        ox -= size
+        index |= 1
+      if y < oy:
+        oy -= size
+        index |= 2
+      if z < oz:
+        oz -= size
+        index |= 4
+      if self.root is not None:
+        children = [None] * 8
+        children[index] = self.root
+        self.root = children
+      self.root_origin = (ox, oy, oz)
+      self.root_size = size * 2
+
+  def _lookup(self, pos):
+    x, y, z = int(pos[0]), int(pos[1]), int(pos[2])
+    if not self._inside(x, y, z):
+      return None
+    node = self.root
+    ox, oy, oz = self.root_origin
+    size = self.root_size
+    while type(node) is list:
+      size >>= 1
+      index = 0
+      if x >= ox + size:
+        ox += size
+        index |= 1
+      if y >= oy + size:
+        oy += size
+        index |= 2
+      if z >= oz + size:
+        oz += size
+        index |= 4
+      node = node[index]
+    if isinstance(node, VoxelBrick):
+      local = (x - ox, y - oy, z - oz)
+      bid = int(node.batch_ids[local])
+      if bid < 0:
+        return None
+      return (bid, int(node.colors[local]))
+    return node
+
+  def get(self, pos, default=-1):
+    value = self._lookup(pos)
+    return default if value is None else value[0]
+
+  def get_color(self, pos, default=-1):
+    value = self._lookup(pos)
+    return default if value is None else value[1]
+
+  def set(self, pos, batch_id, color_index):
+    x, y, z = int(pos[0]), int(pos[1]), int(pos[2])
+    self._grow_to(x, y, z)
+    self._write(x, y, z, (int(batch_id), int(color_index)))
+
+  def discard(self, pos):
+    x, y, z = int(pos[0]), int(pos[1]), int(pos[2])
+    if self._inside(x, y, z):
+      self._write(x, y, z, None)
+
+  def get_many(self, positions):
+    positions = np.asarray(positions, dtype=np.int64).reshape(-1, 3)
+    return np.array([self.get(pos) for pos in positions.tolist()], dtype=np.int32).reshape(-1)
+
+  def set_many(self, positions, batch_ids, color_indices):
+    positions = np.asarray(positions, dtype=np.int64).reshape(-1, 3)
+    batch_ids = np.broadcast_to(np.asarray(batch_ids, dtype=np.int32), len(positions)).tolist()
+    color_indices = np.broadcast_to(np.asarray(color_indices, dtype=np.uint16), len(positions)).tolist()
+    for pos, batch_id, color_index in zip(positions.tolist(), batch_ids, color_indices):
+      self.set(pos, batch_id, color_index)
+
+  def _write(self, x, y, z, value):
+    path = []
+    parent = None
+    slot = 0
+    node = self.root
+    ox, oy, oz = self.root_origin
+    size = self.root_size
+    while size > self.brick_size:
+      if type(node) is not list:
+        if node == value:
+          return
+        node = [node] * 8
+        self._attach(parent, slot, node)
+      size >>= 1
+      index = 0
+      if x >= ox + size:
+        ox += size
+        index |= 1
+      if y >= oy + size:
+        oy += size
+        index |= 2
+      if z >= oz + size:
+        oz += size
+        index |= 4
+      path.append((parent, slot))
+      parent, slot = node, index
+      node = node[index]
+
+    if not isinstance(node, VoxelBrick):
+      if node == value:
+        return
+      node = VoxelBrick(size, node)
+      self._attach(parent, slot, node)
+    self.count += node.write((x - ox, y - oy, z - oz), value)
+
+    collapsed = node.uniform_value()
+    if collapsed is node:
+      return
+    self._attach(parent, slot, collapsed)
+    while path:
+      children = parent
+      first = children[0]
+      if type(first) is list or isinstance(first, VoxelBrick):
+        return
+      for child in children:
+        if child != first:
+          return
+      parent, slot = path.pop()
+      self._attach(parent, slot, first)
+
+  def _attach(self, parent, slot, node):
+    if parent is None:
+      self.root = node
+    else:
+      parent[slot] = node
+
+  def _children(self, node, origin, size):
+    half = size >> 1
+    for i in range(8):
+      yield i, node[i], (
+        origin[0] + (half if i & 1 else 0),
+        origin[1] + (half if i & 2 else 0),
+        origin[2] + (half if i & 4 else 0)
+      ), half
+
+  def _overlap(self, origin, size, lo, hi):
+    local = []
+    for axis in range(3):
+      start = max(lo[axis], origin[axis])
+      stop = min(hi[axis], origin[axis] + size)
+      if start >= stop:
+        return None
+      local.append((start, stop))
+    return local
+
+  def _visit_box(self, lo, hi):
+    stack = [(self.root, self.root_origin, self.root_size)]
+    while stack:
+      node, origin, size = stack.pop()
+      if node is None:
+        continue
+      overlap = self._overlap(origin, size, lo, hi)
+      if overlap is None:
+        continue
+      if type(node) is list:
+        for _, child, child_origin, half in self._children(node, origin, size):
+          stack.append((child, child_origin, half))
+      else:
+        yield node, origin, overlap
+
+  def read_box(self, origin, size):
+    dims = box_dims(size)
+    lo = tuple(int(c) for c in origin)
+    hi = tuple(c + d for c, d in zip(lo, dims))
+    batch_ids = np.full(dims, -1, dtype=np.int32)
+    colors = np.zeros(dims, dtype=np.uint16)
+    for node, node_origin, overlap in self._visit_box(lo, hi):
+      target = tuple(slice(start - lo[axis], stop - lo[axis]) for axis, (start, stop) in enumerate(overlap))
+      if type(node) is tuple:
+        batch_ids[target] = node[0]
+        colors[target] = node[1]
+      else:
+        local = tuple(slice(start - node_origin[axis], stop - node_origin[axis]) for axis, (start, stop) in enumerate(overlap))
+        batch_ids[target] = node.batch_ids[local]
+        colors[target] = node.colors[local]
+    return batch_ids, colors
+
+  def box_batch_ids(self, origin, size):
+    lo = tuple(int(c) for c in origin)
+    hi = tuple(c + d for c, d in zip(lo, box_dims(size)))
+    found = set()
+    for node, node_origin, overlap in self._visit_box(lo, hi):
+      if type(node) is tuple:
+        found.add(node[0])
+      else:
+        local = tuple(slice(start - node_origin[axis], stop - node_origin[axis]) for axis, (start, stop) in enumerate(overlap))
+        ids = node.batch_ids[local]
+        found.update(np.unique(ids[ids >= 0]).tolist())
+    return np.array(sorted(found), dtype=np.int32)
+
+  def _occupied_count(self, node, size):
+    if node is None:
+      return 0
+    if type(node) is tuple:
+      return size * size * size
+    if isinstance(node, VoxelBrick):
+      return node.count
+    return sum(self._occupied_count(child, size >> 1) for child in node)
+
+  def fill_box(self, origin, size, batch_id, color_index):
+    lo = tuple(int(c) for c in origin)
+    hi = tuple(c + d for c, d in zip(lo, box_dims(size)))
+    self._grow_to(*lo)
+    self._grow_to(*(c - 1 for c in hi))
+    value = (int(batch_id), int(color_index))
+    self.root = self._fill_box(self.root, self.root_origin, self.root_size, lo, hi, value)
+
+  def _fill_box(self, node, origin, size, lo, hi, value):
+    overlap = self._overlap(origin, size, lo, hi)
+    if overlap is None or node == value:
+      return node
+    if all(start == origin[axis] and stop == origin[axis] + size for axis, (start, stop) in enumerate(overlap)):
+      self.count += size * size * size - self._occupied_count(node, size)
+      return value
+    if type(node) is not list and not isinstance(node, VoxelBrick):
+      node = VoxelBrick(size, node) if size == self.brick_size else [node] * 8
+    if isinstance(node, VoxelBrick):
+      local = tuple(slice(start - origin[axis], stop - origin[axis]) for axis, (start, stop) in enumerate(overlap))
+      ids = node.batch_ids[local]
+      added = ids.size - int(np.count_nonzero(ids >= 0))
+      ids[...] = value[0]
+      node.colors[local] = value[1]
+      node.count += added
+      self.count += added
+      return node.uniform_value()
+    for i, child, child_origin, half in self._children(node, origin, size):
+      node[i] = self._fill_box(child, child_origin, half, lo, hi, value)
+    return self._collapse(node)
+
+  def clear_box(self, origin, size, batch_id=None):
+    lo = tuple(int(c) for c in origin)
+    hi = tuple(c + d for c, d in zip(lo, box_dims(size)))
+    self.root = self._clear_box(self.root, self.root_origin, self.root_size, lo, hi, batch_id)
+
+  def clear_batches(self, positions, sizes, batch_ids):
+    sizes = np.broadcast_to(np.asarray(sizes, dtype=np.int64), len(positions))
+    for position, size, batch_id in zip(np.asarray(positions).tolist(), sizes.tolist(), np.asarray(batch_ids).tolist()):
+      self.clear_box(position, size, batch_id)
+
+  def _clear_box(self, node, origin, size, lo, hi, batch_id):
+    if node is None:
+      return None
+    for axis in range(3):
+      if hi[axis] <= origin[axis] or lo[axis] >= origin[axis] + size:
+        return node
+    covered = all(lo[axis] <= origin[axis] and origin[axis] + size <= hi[axis] for axis in range(3))
+    if type(node) is tuple:
+      if batch_id is not None and node[0] != batch_id:
+        return node
+      if covered:
+        self.count -= size * size * size
+        return None
+      node = VoxelBrick(size, node) if size == self.brick_size else [node] * 8
+    if isinstance(node, VoxelBrick):
+      local = tuple(slice(max(lo[axis] - origin[axis], 0), min(hi[axis] - origin[axis], size)) for axis in range(3))
+      ids = node.batch_ids[local]
+      cells = ids >= 0 if batch_id is None else ids == batch_id
+      removed = int(np.count_nonzero(cells))
+      if removed:
+        ids[cells] = -1
+        node.colors[local][cells] = 0
+        node.count -= removed
+        self.count -= removed
+      return node.uniform_value()
+    for i, child, child_origin, half in self._children(node, origin, size):
+      node[i] = self._clear_box(child, child_origin, half, lo, hi, batch_id)
+    return self._collapse(node)
+
+  def chunk_keys(self, chunk_size=CHUNK_SIZE):
+    shift = chunk_size.bit_length() - 1
+    keys = set()
+    for node, origin, size in self._leaves():
+      if isinstance(node, VoxelBrick) and size > chunk_size:
+        cells = np.argwhere(node.batch_ids >= 0) + np.array(origin, dtype=np.int64)
+        keys.update(map(tuple, np.unique(cells >> shift, axis=0).tolist()))
+        continue
+      # Growing the root toward negative coordinates leaves nodes that are
+      # not aligned to the chunk grid, so a uniform leaf may straddle chunks.
+      ranges = [range(c >> shift, ((c + size - 1) >> shift) + 1) for c in origin]
+      keys.update((x, y, z) for x in ranges[0] for y in ranges[1] for z in ranges[2])
+    return keys
+
+  def remap(self, mapping):
+    self.root = self._remap(self.root, mapping)
+
+  def _remap(self, node, mapping):
+    if node is None:
+      return None
+    if type(node) is tuple:
+      return (int(mapping[node[0]]), node[1])
+    if isinstance(node, VoxelBrick):
+      cells = node.batch_ids >= 0
+      node.batch_ids[cells] = mapping[node.batch_ids[cells]]
+      return node
+    return [self._remap(child, mapping) for child in node]
+
+  def _collapse(self, children):
+    first = children[0]
+    if type(first) is list or isinstance(first, VoxelBrick):
+      return children
+    for child in children:
+      if child != first:
+        return children
+    return first
+
+  def _leaves(self):
+    stack = [(self.root, self.root_origin, self.root_size)]
+    while stack:
+      node, origin, size = stack.pop()
+      if node is None:
+        continue
+      if type(node) is list:
+        for _, child, child_origin, half in self._children(node, origin, size):
+          stack.append((child, child_origin, half))
+      else:
+        yield node, origin, size
+
+  def occupied(self):
+    positions = []
+    batch_ids = []
+    colors = []
+    for node, origin, size in self._leaves():
+      if isinstance(node, VoxelBrick):
+        cells = node.batch_ids >= 0
+        positions.append(np.argwhere(cells) + np.array(origin, dtype=np.int64))
+        batch_ids.append(node.batch_ids[cells])
+        colors.append(node.colors[cells])
+      else:
+        grid = np.indices((size, size, size), dtype=np.int64).reshape(3, -1).T
+        positions.append(grid + np.array(origin, dtype=np.int64))
+        batch_ids.append(np.full(len(grid), node[0], dtype=np.int32))
+        colors.append(np.full(len(grid), node[1], dtype=np.uint16))
+    if not positions:
+      return np.empty((0, 3), dtype=np.int64), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.uint16)
+    return np.concatenate(positions), np.concatenate(batch_ids), np.concatenate(colors)
+
+  @property
+  def nbytes(self):
+    total = 0
+    stack = [self.root]
+    while stack:
+      node = stack.pop()
+      if node is None:
+        continue
+      if type(node) is list:
+        total += sys.getsizeof(node)
+        stack.extend(node)
+      elif isinstance(node, VoxelBrick):
+        total += node.nbytes
+      else:
+        total += sys.getsizeof(node)
+    return total
+
+VOXEL_STORES = {
+  'chunked': ChunkedVoxelStore,
+  'sparse': SparseVoxelStore,
+}
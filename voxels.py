@@ -2,33 +2,351 @@ import glfw
 import numpy as np
 from OpenGL.GL import *
 import ctypes
+from voxel_store import VOXEL_STORES, CHUNK_SIZE, box_chunk_keys, pack_positions
+from mesh_builder import (
+  FACE_INDICES, LOD_FACTORS, PACKED_VERTEX, VERTEX_BYTES,
+  CellSnapshot, batch_faces, build_cube_faces, build_lod_mesh, encode_vertices, exposed_faces, face_owners,
+  face_slab_boxes, mesh_chunk_cells, mesh_faces, prepare_upload, read_chunk, vertex_bounds
+)
+from batch_table import BatchTable
+from gpu_allocator import RangeAllocator
+from mesh_worker import MeshWorker
+from mesh_pool import MeshPool
 
-def get_cube_faces(size):
-  half = size * 0.5
-  return [
-    ([-half, -half, -half], [half, -half, -half], [half, half, -half], [-half, half, -half], [0, 0, -1]),
-    ([-half, -half, half], [half, -half, half], [half, half, half], [-half, half, half], [0, 0, 1]),
-    ([-half, -half, -half], [half, -half, -half], [half, -half, half], [-half, -half, half], [0, -1, 0]),
-    ([-half, half, -half], [half, half, -half], [half, half, half], [-half, half, half], [0, 1, 0]),
-    ([half, -half, -half], [half, half, -half], [half, half, half], [half, -half, half], [1, 0, 0]),
-    ([-half, -half, -half], [-half, half, -half], [-half, half, half], [-half, -half, half], [-1, 0, 0]),
-  ]
+def setup_vertex_attributes(vertex_format):
+  if vertex_format == 'packed':
+    stride = PACKED_VERTEX.itemsize
+    glVertexAttribIPointer(0, 3, GL_SHORT, stride, ctypes.c_void_p(0))
+    glEnableVertexAttribArray(0)
+    glVertexAttribIPointer(1, 1, GL_UNSIGNED_BYTE, stride, ctypes.c_void_p(6))
+    glEnableVertexAttribArray(1)
+    glVertexAttribIPointer(2, 1, GL_UNSIGNED_SHORT, stride, ctypes.c_void_p(8))
+    glEnableVertexAttribArray(2)
+    return
+  stride = VERTEX_BYTES['float']
+  glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
+  glEnableVertexAttribArray(0)
+  glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(12))
+  glEnableVertexAttribArray(1)
+  glVertexAttribPointer(2, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(24))
+  glEnableVertexAttribArray(2)
 
-class Voxels:
+def frustum_planes(pvm_matrix):
+  """Six clip planes (a, b, c, d) of a projection-view matrix, pointing inward."""
+  m = np.asarray(pvm_matrix, dtype=np.float64)
+  return np.stack([m[3] + m[0], m[3] - m[0], m[3] + m[1], m[3] - m[1], m[3] + m[2], m[3] - m[2]])
+
+def boxes_in_frustum(planes, lo, hi):
+  """True for each AABB that is not fully outside one of the planes."""
+  normals = planes[:, :3]
+  corners = np.where(normals[None, :, :] > 0, hi[:, None, :], lo[:, None, :])
+  return (np.einsum('npc,pc->np', corners, normals) + planes[:, 3] >= 0).all(axis=1)
+
+LIGHT_ANGLES = np.radians([30.0, 30.0])
+LIGHT_DIR = -np.array([
+  np.cos(LIGHT_ANGLES[0]) * np.cos(LIGHT_ANGLES[1]),
+  -np.sin(LIGHT_ANGLES[1]),
+  np.sin(LIGHT_ANGLES[0]) * np.cos(LIGHT_ANGLES[1])
+], dtype=np.float32)
+LIGHT_COLOR = np.array([1.0, 1.0, 0.95], dtype=np.float32)
+AMBIENT_INTENSITY = 0.4
+
+class ChunkBuffers:
+  """VAO/VBO/EBO holding the mesh of one spatial chunk."""
+  def __init__(self, vertex_format):
+    self.VAO = glGenVertexArrays(1)
+    self.VBO = glGenBuffers(1)
+    self.EBO = glGenBuffers(1)
+    self.vertex_count = 0
+    self.index_count = 0
+    self.nbytes = 0
+    self.bounds = (np.zeros(3), np.zeros(3))
+    glBindVertexArray(self.VAO)
+    glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.EBO)
+    setup_vertex_attributes(vertex_format)
+    glBindVertexArray(0)
+
+  def upload(self, vertices, indices, bounds):
+    self.bounds = bounds
+    glBindVertexArray(self.VAO)
+    glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
+    glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+    glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+    glBindVertexArray(0)
+    self.vertex_count = len(vertices)
+    self.index_count = len(indices)
+    self.nbytes = vertices.nbytes + indices.nbytes
+
+  def draw(self):
+    glBindVertexArray(self.VAO)
+    glDrawElements(GL_TRIANGLES, self.index_count, GL_UNSIGNED_INT, None)
+
+  def delete(self):
+    glDeleteVertexArrays(1, [self.VAO])
+    glDeleteBuffers(2, [self.VBO, self.EBO])
+    self.VAO = self.VBO = self.EBO = 0
+
+class GeometryPool:
+  """
+  One persistent VBO/EBO pair shared by every mesh. Each key gets its own
+  vertex and index range from a RangeAllocator and is written with
+  glBufferSubData; indices stay local and are drawn with base-vertex offsets.
+  """
+  def __init__(self, vertex_format, vertex_capacity=1 << 16, index_capacity=1 << 17):
+    self.vertex_format = vertex_format
+    self.vertex_bytes = VERTEX_BYTES[vertex_format]
+    self.VAO = glGenVertexArrays(1)
+    self.VBO = 0
+    self.EBO = 0
+    self.vertex_ranges = RangeAllocator()
+    self.index_ranges = RangeAllocator()
+    self.ranges = {}
+    self.draw_lists = None
+    self._grow_vertices(vertex_capacity)
+    self._grow_indices(index_capacity)
+
+  def __len__(self):
+    return len(self.ranges)
+
+  @property
+  def vertex_count(self):
+    return self.vertex_ranges.used
+
+  @property
+  def index_count(self):
+    return self.index_ranges.used
+
+  @property
+  def nbytes(self):
+    return self.vertex_ranges.capacity * self.vertex_bytes + self.index_ranges.capacity * 4
+
+  def _resize_buffer(self, old, old_bytes, new_bytes):
+    new = glGenBuffers(1)
+    glBindBuffer(GL_COPY_WRITE_BUFFER, new)
+    glBufferData(GL_COPY_WRITE_BUFFER, new_bytes, None, GL_DYNAMIC_DRAW)
+    if old:
+      glBindBuffer(GL_COPY_READ_BUFFER, old)
+      glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, 0, 0, old_bytes)
+      glDeleteBuffers(1, [old])
+    return new
+
+  def _grow_vertices(self, capacity):
+    self.VBO = self._resize_buffer(self.VBO, self.vertex_ranges.capacity * self.vertex_bytes, capacity * self.vertex_bytes)
+    self.vertex_ranges.grow(capacity)
+    glBindVertexArray(self.VAO)
+    glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
+    setup_vertex_attributes(self.vertex_format)
+    glBindVertexArray(0)
+
+  def _grow_indices(self, capacity):
+    self.EBO = self._resize_buffer(self.EBO, self.index_ranges.capacity * 4, capacity * 4)
+    self.index_ranges.grow(capacity)
+    glBindVertexArray(self.VAO)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.EBO)
+    glBindVertexArray(0)
+
+  def _allocate(self, allocator, grow, count):
+    offset = allocator.allocate(count)
+    if offset is None:
+      grow(max(allocator.capacity * 2, allocator.capacity + count))
+      offset = allocator.allocate(count)
+    return offset
+
+  def write(self, key, vertices, indices, bounds):
+    self.release(key)
+    vertex_offset = self._allocate(self.vertex_ranges, self._grow_vertices, len(vertices))
+    index_offset = self._allocate(self.index_ranges, self._grow_indices, len(indices))
+    indices = np.ascontiguousarray(indices, dtype=np.uint32)
+    glBindBuffer(GL_COPY_WRITE_BUFFER, self.VBO)
+    glBufferSubData(GL_COPY_WRITE_BUFFER, vertex_offset * self.vertex_bytes, vertices.nbytes, vertices)
+    glBindBuffer(GL_COPY_WRITE_BUFFER, self.EBO)
+    glBufferSubData(GL_COPY_WRITE_BUFFER, index_offset * 4, indices.nbytes, indices)
+    self.ranges[key] = (vertex_offset, index_offset, len(indices), *bounds[0], *bounds[1])
+    self.draw_lists = None
+
+  def release(self, key):
+    entry = self.ranges.pop(key, None)
+    if entry is None:
+      return
+    self.vertex_ranges.release(entry[0])
+    self.index_ranges.release(entry[1])
+    self.draw_lists = None
+
+  def remap(self, mapping):
+    for key in [k for k in self.ranges if mapping[k] < 0]:
+      self.release(key)
+    self.ranges = {int(mapping[k]): entry for k, entry in self.ranges.items()}
+
+  def draw(self, planes=None):
+    if not self.ranges:
+      return 0
+    if self.draw_lists is None:
+      table = np.array(list(self.ranges.values()), dtype=np.float64).reshape(-1, 9)
+      offsets = (table[:, 1] * 4).astype(np.uintp)
+      self.draw_lists = (
+        table[:, 2].astype(np.int32),
+        offsets,
+        (ctypes.c_void_p * len(offsets)).from_buffer(offsets),
+        table[:, 0].astype(np.int32),
+        table[:, 3:6],
+        table[:, 6:9]
+      )
+    counts, offsets, pointers, base_vertices, lo, hi = self.draw_lists
+    if planes is not None:
+      visible = boxes_in_frustum(planes, lo, hi)
+      if not visible.all():
+        counts, offsets, base_vertices = counts[visible], offsets[visible], base_vertices[visible]
+        pointers = (ctypes.c_void_p * len(offsets)).from_buffer(offsets)
+    if len(counts):
+      glBindVertexArray(self.VAO)
+      glMultiDrawElementsBaseVertex(GL_TRIANGLES, counts, GL_UNSIGNED_INT, pointers, len(counts), base_vertices)
+    return len(counts)
+
+  def delete(self):
+    glDeleteVertexArrays(1, [self.VAO])
+    glDeleteBuffers(2, [self.VBO, self.EBO])
+    self.VAO = self.VBO = self.EBO = 0
+
+INSTANCE_DTYPE = np.dtype([
+  ('origin', '<i4', 3),
+  ('size', '<u4'),
+  ('color', '<f4', 3),
+  ('mask', '<u4')
+])
+
+class InstancedCubes:
+  """
+  One unit cube drawn once per BatchTable row. Instance records mirror the
+  table (origin, size, color, face mask) and are rewritten in place when a
+  row changes; dead rows have size 0 and no visible faces.
+  """
   def __init__(self):
-    self.voxels = {}
-    self.batches = []
-    self.geometry_data = []
+    vertices, _ = build_cube_faces(np.zeros((1, 3)), np.ones(1), np.ones((1, 3), dtype=np.float32), np.ones((1, 6), dtype=bool))
+    cube = np.zeros(24, dtype=[('position', '<f4', 3), ('normal', '<f4', 3), ('face', '<u4')])
+    cube['position'] = vertices[:, :3]
+    cube['normal'] = vertices[:, 3:6]
+    cube['face'] = np.repeat(np.arange(6), 4)
+    cube = cube.view(np.uint8)
     self.VAO = glGenVertexArrays(1)
     self.VBO = glGenBuffers(1)
     self.EBO = glGenBuffers(1)
-    self.shader_program = self.create_shader_program()
+    self.instance_VBO = glGenBuffers(1)
+    self.capacity = 0
+    glBindVertexArray(self.VAO)
+    glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
+    glBufferData(GL_ARRAY_BUFFER, cube.nbytes, cube, GL_STATIC_DRAW)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.EBO)
+    glBufferData(GL_ELEMENT_ARRAY_BUFFER, FACE_INDICES.nbytes, FACE_INDICES, GL_STATIC_DRAW)
+    glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 28, ctypes.c_void_p(0))
+    glEnableVertexAttribArray(0)
+    glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 28, ctypes.c_void_p(12))
+    glEnableVertexAttribArray(1)
+    glVertexAttribIPointer(2, 1, GL_UNSIGNED_INT, 28, ctypes.c_void_p(24))
+    glEnableVertexAttribArray(2)
+    stride = INSTANCE_DTYPE.itemsize
+    glBindBuffer(GL_ARRAY_BUFFER, self.instance_VBO)
+    glVertexAttribIPointer(3, 3, GL_INT, stride, ctypes.c_void_p(0))
+    glVertexAttribIPointer(4, 1, GL_UNSIGNED_INT, stride, ctypes.c_void_p(12))
+    glVertexAttribPointer(5, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(16))
+    glVertexAttribIPointer(6, 1, GL_UNSIGNED_INT, stride, ctypes.c_void_p(28))
+    for location in range(3, 7):
+      glEnableVertexAttribArray(location)
+      glVertexAttribDivisor(location, 1)
+    glBindVertexArray(0)
+
+  @property
+  def nbytes(self):
+    return self.capacity * INSTANCE_DTYPE.itemsize
+
+  def records(self, batches, palette, ids):
+    records = np.zeros(len(ids), dtype=INSTANCE_DTYPE)
+    alive = batches.alive[ids]
+    records['origin'] = batches.positions[ids]
+    records['size'] = np.where(alive, batches.sizes[ids], 0)
+    records['color'] = palette[batches.colors[ids]] if len(palette) else 0
+    records['mask'] = np.where(alive, batches.face_masks[ids], 0)
+    return records
+
+  def write(self, batches, palette, ids):
+    glBindBuffer(GL_ARRAY_BUFFER, self.instance_VBO)
+    if self.capacity != batches.capacity:
+      self.capacity = batches.capacity
+      records = self.records(batches, palette, np.arange(self.capacity))
+      glBufferData(GL_ARRAY_BUFFER, records.nbytes, records.view(np.uint8), GL_DYNAMIC_DRAW)
+      return
+    ids = np.unique(np.asarray(ids, dtype=np.int64))
+    for run in np.split(ids, np.flatnonzero(np.diff(ids) > 1) + 1):
+      if len(run):
+        records = self.records(batches, palette, run)
+        glBufferSubData(GL_ARRAY_BUFFER, int(run[0]) * INSTANCE_DTYPE.itemsize, records.nbytes, records.view(np.uint8))
+
+  def draw(self, count):
+    if count:
+      glBindVertexArray(self.VAO)
+      glDrawElementsInstanced(GL_TRIANGLES, len(FACE_INDICES), GL_UNSIGNED_INT, None, count)
+
+  def delete(self):
+    glDeleteVertexArrays(1, [self.VAO])
+    glDeleteBuffers(3, [self.VBO, self.EBO, self.instance_VBO])
+    self.VAO = self.VBO = self.EBO = self.instance_VBO = 0
+    self.capacity = 0
+
+class Voxels:
+  def __init__(self, backend='chunked'):
+    self.voxels = VOXEL_STORES[backend]()
+    self.palette = []
+    self.palette_lookup = {}
+    self.batches = BatchTable()
+    self.geometry_data = []
+    self.chunk_batches = {}
+    self.chunk_buffers = {}
+    self.chunk_draw_list = None
+    self.dirty_buffers = set()
+    self.frustum_culling = True
+    self.cull_stats = {'drawn': 0, 'culled': 0}
+    self.lod_enabled = True
+    self.lod_distances = [128.0, 256.0, 384.0]
+    self.lod_hysteresis = 0.1
+    self.lod_build_budget = 4
+    self.lod_buffers = {}
+    self.lod_builds = 0
+    self.oversized_batches = None
+    self.chunk_levels = {}
+    self.lod_state = None
+    self.lod_bounds = None
+    self.stale_lods = set()
+    self.lod_stats = [0] * len(LOD_FACTORS)
+    self.buffer_modes = ['chunks', 'pool']
+    self.buffer_mode = 'chunks'
+    self.pool = None
+    self.dirty_slots = set()
+    self.instances = None
+    self.dirty_instances = set()
+    self.vertex_formats = ['float', 'packed']
+    self.vertex_format = 'float'
+    self.shader_program = 0
+    self.mvp_location = None
     self.vertex_stride = 9
     self.vertices_per_face = 4
     self.indices_per_face = 6
+    self.mesh_modes = ['faces', 'greedy', 'instanced']
+    self.mesh_mode = 'faces'
+    self.chunk_meshes = {}
+    self.dirty_chunks = set()
+    self.mesh_worker = None
+    self.chunk_jobs = {}
+    self.pooled_meshes = {}
+    self.mesh_pool = None
+    self.mesh_processes = None
+    self.mesh_pool_enabled = False
+    self.mesh_pool_threshold = 64
+    self.mesh_stats = {'vertices': 0, 'triangles': 0, 'face_vertices': 0, 'buffer_bytes': 0}
+    self.pending_report = None
+    self.rebuild_count = 0
     self.needs_update = True
 
-  def create_shader_program(self):
+  def create_shader_program(self, vertex_format='float'):
     """
     vertex_shader_src = '''
     #version 330 core
@@ -66,6 +384,61 @@ class Voxels:
       vertexColor = aColor * (ambient + diffuse);
     }
     '''
+    if vertex_format == 'instanced':
+      vertex_shader_src = '''
+      #version 330 core
+      layout(location = 0) in vec3 aPos;
+      layout(location = 1) in vec3 aNormal;
+      layout(location = 2) in uint aFace;
+      layout(location = 3) in ivec3 iOrigin;
+      layout(location = 4) in uint iSize;
+      layout(location = 5) in vec3 iColor;
+      layout(location = 6) in uint iMask;
+      uniform mat4 mvp;
+      uniform vec3 lightDir;
+      uniform vec3 lightColor;
+      uniform float ambientIntensity;
+      out vec3 vertexColor;
+      void main() {
+        bool visible = ((iMask >> aFace) & 1u) != 0u;
+        vec3 position = vec3(iOrigin) + aPos * float(iSize);
+        gl_Position = visible ? mvp * vec4(position, 1.0) : vec4(0.0);
+        float diffuseIntensity = max(dot(aNormal, lightDir), 0.0);
+        vec3 diffuse = diffuseIntensity * lightColor;
+        vec3 ambient = ambientIntensity * lightColor;
+        vertexColor = iColor * (ambient + diffuse);
+      }
+      '''
+    if vertex_format == 'packed':
+      vertex_shader_src = '''
+      #version 330 core
+      layout(location = 0) in ivec3 aPos;
+      layout(location = 1) in uint aNormal;
+      layout(location = 2) in uint aColor;
+      uniform mat4 mvp;
+      uniform vec3 lightDir;
+      uniform vec3 lightColor;
+      uniform float ambientIntensity;
+      out vec3 vertexColor;
+      const vec3 normals[6] = vec3[6](
+        vec3(0.0, 0.0, -1.0), vec3(0.0, 0.0, 1.0),
+        vec3(0.0, -1.0, 0.0), vec3(0.0, 1.0, 0.0),
+        vec3(1.0, 0.0, 0.0), vec3(-1.0, 0.0, 0.0)
+      );
+      void main() {
+        vec3 normal = normals[aNormal];
+        vec3 color = vec3(
+          float((aColor >> 11) & 31u) / 31.0,
+          float((aColor >> 5) & 63u) / 63.0,
+          float(aColor & 31u) / 31.0
+        );
+        gl_Position = mvp * vec4(vec3(aPos), 1.0);
+        float diffuseIntensity = max(dot(normal, lightDir), 0.0);
+        vec3 diffuse = diffuseIntensity * lightColor;
+        vec3 ambient = ambientIntensity * lightColor;
+        vertexColor = color * (ambient + diffuse);
+      }
+      '''
     fragment_shader_src = '''
     #version 330 core
     in vec3 vertexColor;
@@ -94,192 +467,797 @@ class Voxels:
     glDeleteShader(fs)
     return program
 
+  def color_index(self, color):
+    key = tuple(float(c) for c in color[:3])
+    index = self.palette_lookup.get(key)
+    if index is None:
+      index = len(self.palette)
+      self.palette.append(key)
+      self.palette_lookup[key] = index
+    return index
+
+  def get_color(self, pos):
+    index = self.voxels.get_color(pos)
+    if index < 0:
+      return None
+    return self.palette[index]
+
+  def clear(self):
+    self.voxels.clear()
+    self.batches.clear()
+    self.geometry_data.clear()
+    self.chunk_meshes.clear()
+    self.dirty_chunks.clear()
+    self.chunk_batches.clear()
+    self._reset_buffers()
+
+  def set_mesh_mode(self, mode):
+    if mode not in self.mesh_modes:
+      raise ValueError(f"Unknown mesh mode '{mode}'")
+    if mode == self.mesh_mode:
+      return
+    variant = self._shader_variant()
+    self.mesh_mode = mode
+    if self._shader_variant() != variant:
+      self._reload_shader()
+    self.chunk_meshes.clear()
+    self.dirty_chunks = self.voxels.chunk_keys(CHUNK_SIZE)
+    self.geometry_data = []
+    self._sync_faces(mode == 'faces')
+    self._reset_buffers()
+
+  def _shader_variant(self):
+    if self.mesh_mode == 'instanced':
+      return 'instanced'
+    return self.vertex_format
+
+  def _load_shader(self, variant):
+    if self.shader_program:
+      glDeleteProgram(self.shader_program)
+    self.shader_program = self.create_shader_program(variant)
+    self.mvp_location = glGetUniformLocation(self.shader_program, "mvp")
+    glUseProgram(self.shader_program)
+    glUniform3fv(glGetUniformLocation(self.shader_program, "lightDir"), 1, LIGHT_DIR)
+    glUniform3fv(glGetUniformLocation(self.shader_program, "lightColor"), 1, LIGHT_COLOR)
+    glUniform1f(glGetUniformLocation(self.shader_program, "ambientIntensity"), AMBIENT_INTENSITY)
+    glUseProgram(0)
+
+  def _reload_shader(self):
+    if self.shader_program:
+      self._load_shader(self._shader_variant())
+
+  def set_vertex_format(self, vertex_format):
+    if vertex_format not in self.vertex_formats:
+      raise ValueError(f"Unknown vertex format '{vertex_format}'")
+    if vertex_format == self.vertex_format:
+      return
+    self.vertex_format = vertex_format
+    self._reload_shader()
+    self._reset_buffers()
+
+  def set_buffer_mode(self, mode):
+    if mode not in self.buffer_modes:
+      raise ValueError(f"Unknown buffer mode '{mode}'")
+    if mode == self.buffer_mode:
+      return
+    background = self._background_faces()
+    self.buffer_mode = mode
+    self._sync_faces(background and self.mesh_mode == 'faces')
+    self._reset_buffers()
+
+  def _drop_buffers(self):
+    for buffers in self.chunk_buffers.values():
+      buffers.delete()
+    self.chunk_buffers.clear()
+    self.chunk_draw_list = None
+    for buffers in self.lod_buffers.values():
+      if buffers is not None:
+        buffers.delete()
+    self.lod_buffers.clear()
+    self.stale_lods.clear()
+    if self.pool is not None:
+      self.pool.delete()
+      self.pool = None
+    if self.instances is not None:
+      self.instances.delete()
+      self.instances = None
+
+  def _reset_buffers(self):
+    self._drop_buffers()
+    if self.mesh_worker is not None:
+      self.dirty_chunks.update(self.chunk_jobs)
+      self.chunk_jobs.clear()
+      self.pooled_meshes.clear()
+      self.mesh_worker.reset()
+    self.dirty_buffers = set(self.chunk_batches) | set(self.chunk_meshes)
+    self.dirty_slots = set(self.batches.geometry_slots[self.batches.live_ids()].tolist())
+    self.dirty_instances = set()
+    self.needs_update = True
+
+  def _batch_chunks(self, voxel_ids):
+    shift = CHUNK_SIZE.bit_length() - 1
+    return [tuple(key) for key in (self.batches.positions[voxel_ids] >> shift).tolist()]
+
+  def _index_batches(self, voxel_ids):
+    for key, voxel_id in zip(self._batch_chunks(voxel_ids), np.asarray(voxel_ids).tolist()):
+      self.chunk_batches.setdefault(key, set()).add(voxel_id)
+
+  def _unindex_batches(self, voxel_ids):
+    for key, voxel_id in zip(self._batch_chunks(voxel_ids), np.asarray(voxel_ids).tolist()):
+      members = self.chunk_batches[key]
+      members.discard(voxel_id)
+      if not members:
+        del self.chunk_batches[key]
+      self.dirty_buffers.add(key)
+
+  def mesh_report(self):
+    return (f"Mesh mode '{self.mesh_mode}': {self.mesh_stats['vertices']} vertices "
+            f"(per-face: {self.mesh_stats['face_vertices']})")
+
+  def buffer_report(self):
+    return f"Vertex format '{self.vertex_format}': {self.mesh_stats['buffer_bytes']} bytes in GPU buffers"
+
+  def meshing(self):
+    """True while background meshes are still being built or waiting to be uploaded."""
+    if self.mesh_worker is None:
+      return False
+    return bool(self.chunk_jobs or self.pooled_meshes or self.mesh_worker.pending)
+
+  def queue_report(self, report):
+    """
+    Prints report() once mesh_stats describe the finished meshes: right away
+    without a worker, otherwise from the update_buffers call that follows
+    the last background result.
+    """
+    self.pending_report = report
+    self._print_report()
+
+  def _print_report(self):
+    if self.pending_report is not None and not self.needs_update and not self.meshing():
+      print(self.pending_report())
+      self.pending_report = None
+
+  def _chunks_near(self, origins, sizes, margin):
+    return box_chunk_keys(origins, sizes, CHUNK_SIZE.bit_length() - 1, margin)
+
+  def _mark_dirty(self, origins, sizes):
+    origins = np.asarray(origins, dtype=np.int64).reshape(-1, 3)
+    sizes = np.broadcast_to(np.asarray(sizes, dtype=np.int64), len(origins))
+    near = self._chunks_near(origins, sizes, 1)
+    self.dirty_chunks.update(near)
+    self.stale_lods.update(self._chunks_near(origins, sizes, LOD_FACTORS[-1]))
+    self.oversized_batches = None
+    if self._background_faces():
+      self._queue_faces(origins, sizes, near)
+
+  def _queue_faces(self, origins, sizes, near):
+    """
+    Marks the buffers of every batch whose faces an edit of these boxes can
+    change: batches of the chunks next to the boxes, and oversized batches
+    reaching them from further away. Jobs already running for those chunks
+    are disowned, so their face masks are never applied.
+    """
+    keys = near & self.chunk_batches.keys()
+    oversized = self._oversized(self.batches.live_ids())
+    if len(oversized):
+      lo = origins.min(axis=0) - 1
+      hi = (origins + sizes[:, None]).max(axis=0) + 1
+      start = self.batches.positions[oversized]
+      end = start + self.batches.sizes[oversized, None]
+      keys.update(self._batch_chunks(oversized[((start < hi) & (end > lo)).all(axis=1)]))
+    for key in keys:
+      self.chunk_jobs.pop(key, None)
+    self.dirty_buffers.update(keys)
+
+  def compact(self):
+    mapping = self.batches.compact()
+    self.voxels.remap(mapping)
+    live = np.nonzero(mapping >= 0)[0]
+    self.geometry_data = [self.geometry_data[i] if i < len(self.geometry_data) else None for i in live]
+    self.chunk_batches.clear()
+    self._index_batches(self.batches.live_ids())
+    self.oversized_batches = None
+    if self._background_faces():
+      # Results still in flight name the old ids.
+      self.dirty_buffers.update(self.chunk_jobs)
+      self.chunk_jobs.clear()
+      self.pooled_meshes.clear()
+    if self.pool is not None and self.mesh_mode == 'faces':
+      self.pool.remap(mapping)
+    self.dirty_slots = {int(mapping[s]) for s in self.dirty_slots if mapping[s] >= 0}
+    self.dirty_instances.update(range(len(mapping)))
+    self.needs_update = True
+    return mapping
+
   def aligned(self, coord, size):
     return tuple((np.floor(np.array(coord) / size) * size).astype(int))
 
   def on_key_event(self, key, action, camera, overlay):
+    if key == glfw.KEY_G and action == glfw.RELEASE:
+      index = self.mesh_modes.index(self.mesh_mode)
+      self.set_mesh_mode(self.mesh_modes[(index + 1) % len(self.mesh_modes)])
+      self.update_buffers()
+      self.queue_report(self.mesh_report)
+    if key == glfw.KEY_P and action == glfw.RELEASE:
+      index = self.buffer_modes.index(self.buffer_mode)
+      self.set_buffer_mode(self.buffer_modes[(index + 1) % len(self.buffer_modes)])
+      print(f"Buffer mode '{self.buffer_mode}'")
+    if key == glfw.KEY_K and action == glfw.RELEASE:
+      index = self.vertex_formats.index(self.vertex_format)
+      self.set_vertex_format(self.vertex_formats[(index + 1) % len(self.vertex_formats)])
+      self.update_buffers()
+      self.queue_report(self.buffer_report)
     if key == glfw.KEY_A and action == glfw.RELEASE:
       if camera.is_moving:
         return
       base = self.aligned(camera.target - camera.unit * 0.5, camera.unit)
       size = int(camera.unit)
-      to_remove = []
-      for dx in range(size):
-        for dy in range(size):
-          for dz in range(size):
-            pos = (base[0] + dx, base[1] + dy, base[2] + dz)
-            if pos in  self.voxels:
-              if  self.voxels[pos]['size'] <= size:
-                to_remove.append( self.voxels[pos]['voxel_id'])
-      if to_remove:
-        for bid in set(to_remove):
-          self.remove_batch(bid)
+      to_remove = self.voxels.box_batch_ids(base, size)
+      to_remove = to_remove[self.batches.sizes[to_remove] <= size]
+      if len(to_remove):
+        self.remove_batches(to_remove)
       else:
         self.add_batch(base, size, overlay.color)
 
 
   def add_batch(self, origin, size, color):
-    if origin in  self.voxels:
-      print(f"Conflict at {origin} (already occupied by batch { self.voxels[origin]['voxel_id']})")
-    for dx in range(size):
-      for dy in range(size):
-        for dz in range(size):
-          pos = (origin[0] + dx, origin[1] + dy, origin[2] + dz)
-          if pos in  self.voxels:
-            if  self.voxels[pos]['size'] >= size:
-              return
-    to_remove = []
-    for dx in range(size):
-      for dy in range(size):
-        for dz in range(size):
-          pos = (origin[0] + dx, origin[1] + dy, origin[2] + dz)
-          if pos in  self.voxels:
-            to_remove.append( self.voxels[pos]['voxel_id'])
-    for bid in set(to_remove):
-      self.remove_batch(bid)
-
-    voxel_id = len(self.batches)
-    vertices = []
-    indices = []
-    offset = 0
-
-    for dx in range(size):
-      for dy in range(size):
-        for dz in range(size):
-          pos = (origin[0] + dx, origin[1] + dy, origin[2] + dz)
-          self.voxels[pos] = {'voxel_id': voxel_id, 'size': size}
-
-    cube_faces = get_cube_faces(size)
-    center = np.array(origin) + size/2
-
-    for face_idx, (v1, v2, v3, v4, normal) in enumerate(cube_faces):
-      nx, ny, nz = normal
-      hide_face = False
-      if size > 1:
-        neighbor_pos = (
-          int(center[0] + nx * size),
-          int(center[1] + ny * size),
-          int(center[2] + nz * size)
-        )
-        if neighbor_pos in  self.voxels:
-          hide_face = True
-      else:
-        neighbor_pos = (
-          origin[0] + int(nx),
-          origin[1] + int(ny),
-          origin[2] + int(nz)
-        )
-        if neighbor_pos in  self.voxels:
-          hide_face = True
-
-      if hide_face:
+    if origin in self.voxels:
+      print(f"Conflict at {origin} (already occupied by batch {self.voxels.get(origin)})")
+    to_remove = self.voxels.box_batch_ids(origin, size)
+    if (self.batches.sizes[to_remove] >= size).any():
+      return
+    self.remove_batches(to_remove)
+
+    color_index = self.color_index(color)
+    voxel_id = self.batches.add(origin, size, color_index)
+    self.dirty_instances.update(voxel_id.tolist())
+    self._index_batches(voxel_id)
+    self.voxels.fill_box(origin, size, int(voxel_id[0]), color_index)
+    self._mark_dirty(origin, size)
+    if not self._background_faces():
+      self._update_faces(voxel_id, spread=True)
+    self.needs_update = True
+
+  def add_many(self, origins, sizes, colors):
+    origins = np.asarray(origins, dtype=np.int64).reshape(-1, 3)
+    sizes = np.broadcast_to(np.asarray(sizes, dtype=np.int64), len(origins))
+    colors = np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+    if not len(origins):
+      return np.empty(0, dtype=np.int64)
+    unique_colors, color_inverse = np.unique(colors, axis=0, return_inverse=True)
+    palette_indices = np.array([self.color_index(c) for c in unique_colors.tolist()], dtype=np.int64)
+    color_indices = palette_indices[color_inverse.ravel()]
+
+    candidates = []
+    for size in np.unique(sizes).tolist():
+      group = np.nonzero(sizes == size)[0]
+      offsets = np.indices((size, size, size)).reshape(3, -1).T
+      cells = (origins[group][:, None, :] + offsets[None, :, :]).reshape(-1, 3)
+      free = (self.voxels.get_many(cells) < 0).reshape(len(group), -1).all(axis=1)
+      if free.any():
+        candidates.append((group[free], cells.reshape(len(group), -1, 3)[free].reshape(-1, 3)))
+    if not candidates:
+      return np.empty(0, dtype=np.int64)
+    keep = self._claim_cells(len(origins), candidates)
+
+    added = []
+    for group, cells in candidates:
+      cells = cells.reshape(len(group), -1, 3)[keep[group]]
+      group = group[keep[group]]
+      if not len(group):
         continue
+      ids = self.batches.add(origins[group], sizes[group[0]], color_indices[group])
+      self.voxels.set_many(cells.reshape(-1, 3), np.repeat(ids, cells.shape[1]), np.repeat(color_indices[group], cells.shape[1]))
+      added.append(ids)
 
-      face_vertices = [v1, v2, v3, v4]
-      for vertex in face_vertices:
-        p = center + np.array(vertex)
-        vertices.extend([*p, *normal, *color])
-
-      indices.extend([offset, offset + 1, offset + 2, offset + 2, offset + 3, offset])
-      offset += 4
-
-    geometry_index = len(self.geometry_data)
-    self.geometry_data.append({
-      'vertices': vertices,
-      'indices': indices
-    })
-
-    self.batches.append({
-      'geometry_index': geometry_index,
-      'position': tuple(origin),
-      'size': size,
-      'dim': size
-    })
+    if not added:
+      return np.empty(0, dtype=np.int64)
+    added = np.concatenate(added)
+    self.dirty_instances.update(added.tolist())
+    self._index_batches(added)
+    self._mark_dirty(self.batches.positions[added], self.batches.sizes[added])
+    if not self._background_faces():
+      self._update_faces(added, spread=True)
     self.needs_update = True
-  
+    return added
+
+  def _claim_cells(self, count, candidates):
+    """
+    Keep each candidate entry whose cells no earlier kept entry has claimed,
+    in input order, the same outcome as adding them one by one.
+    """
+    entries = np.concatenate([np.repeat(group, len(cells) // len(group)) for group, cells in candidates])
+    keys = pack_positions(np.concatenate([cells for _, cells in candidates]))
+    _, cell_index, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    keep = np.zeros(count, dtype=bool)
+    keep[entries] = True
+    shared = counts[cell_index] > 1
+    if not shared.any():
+      return keep
+    contested = np.unique(entries[shared])
+    keep[contested] = False
+    order = np.argsort(entries, kind='stable')
+    starts = np.searchsorted(entries[order], contested)
+    ends = np.searchsorted(entries[order], contested, side='right')
+    claimed = np.zeros(len(counts), dtype=bool)
+    for entry, start, end in zip(contested.tolist(), starts.tolist(), ends.tolist()):
+      cells = cell_index[order[start:end]]
+      if not claimed[cells].any():
+        claimed[cells] = True
+        keep[entry] = True
+    return keep
+
+  def _face_owners(self, voxel_ids):
+    for group, owners in face_owners(self.voxels, self.batches.positions[voxel_ids], self.batches.sizes[voxel_ids]):
+      yield voxel_ids[group], owners
+
+  def _background_faces(self):
+    """True when faces-mode culling and meshing run as per-chunk worker jobs."""
+    return self.mesh_worker is not None and self.mesh_mode == 'faces' and self.buffer_mode == 'chunks'
+
+  def _sync_faces(self, geometry=False):
+    """
+    In background faces mode no per-batch geometry is kept and face masks
+    arrive with the chunk jobs. Once the mode changes, recomputes the masks
+    of batches whose jobs never landed and, with geometry, rebuilds the
+    geometry of every batch.
+    """
+    if self._background_faces():
+      self.geometry_data = []
+      return
+    keys = self.dirty_buffers | self.chunk_jobs.keys()
+    pending = [voxel_id for key in keys for voxel_id in self.chunk_batches.get(key, ())]
+    if pending:
+      pending = np.array(pending, dtype=np.int64)
+      for group, owners in self._face_owners(pending):
+        masks = exposed_faces(owners)
+        self.dirty_instances.update(group[self.batches.face_masks[group] != masks].tolist())
+        self.batches.face_masks[group] = masks
+    if geometry:
+      self._build_geometry(self.batches.live_ids())
+
+  def _update_faces(self, voxel_ids, spread=False):
+    voxel_ids = np.unique(np.asarray(voxel_ids, dtype=np.int64))
+    voxel_ids = voxel_ids[self.batches.alive[voxel_ids]]
+    stale = []
+    neighbors = []
+    for group, owners in self._face_owners(voxel_ids):
+      masks = exposed_faces(owners)
+      stale.append(group[self.batches.face_masks[group] != masks])
+      self.batches.face_masks[group] = masks
+      if spread:
+        neighbors.append(owners[owners >= 0])
+    if stale:
+      stale = np.concatenate(stale)
+      self.dirty_instances.update(stale.tolist())
+      if self.mesh_mode == 'faces':
+        self._build_geometry(stale)
+    if neighbors:
+      self._update_faces(np.setdiff1d(np.concatenate(neighbors), voxel_ids))
+
+  def _build_geometry(self, voxel_ids):
+    if not len(voxel_ids):
+      return
+    colors = np.array(self.palette, dtype=np.float32)[self.batches.colors[voxel_ids]]
+    vertices, face_counts = batch_faces(
+      self.batches.positions[voxel_ids], self.batches.sizes[voxel_ids], colors, self.batches.face_masks[voxel_ids]
+    )
+
+    self.dirty_buffers.update(self._batch_chunks(voxel_ids))
+    slots = self.batches.geometry_slots[voxel_ids]
+    self.dirty_slots.update(slots.tolist())
+    if len(self.geometry_data) <= slots.max():
+      self.geometry_data.extend([None] * (int(slots.max()) + 1 - len(self.geometry_data)))
+    splits = np.cumsum(face_counts * self.vertices_per_face)[:-1]
+    for slot, batch_vertices, count in zip(slots.tolist(), np.split(vertices, splits), face_counts.tolist()):
+      self.geometry_data[slot] = {
+        'vertices': batch_vertices,
+        'indices': FACE_INDICES[:count * self.indices_per_face]
+      }
+
   def remove_batch(self, voxel_id):
-    if voxel_id >= len(self.batches):
+    self.remove_batches([voxel_id])
+
+  def remove_batches(self, voxel_ids):
+    voxel_ids = np.array([i for i in set(int(i) for i in voxel_ids) if i in self.batches], dtype=np.int64)
+    if not len(voxel_ids):
       return
-    
-    if self.batches[voxel_id] is not None:
-      geometry_index = self.batches[voxel_id]['geometry_index']
-      self.geometry_data[geometry_index] = None
-    
-    self.batches[voxel_id] = None
-    self.voxels = {k: v for k, v in  self.voxels.items() if v['voxel_id'] != voxel_id}
+    for slot in self.batches.geometry_slots[voxel_ids].tolist():
+      if slot < len(self.geometry_data):
+        self.geometry_data[slot] = None
+      self.dirty_slots.add(slot)
+    self.voxels.clear_batches(self.batches.positions[voxel_ids], self.batches.sizes[voxel_ids], voxel_ids)
+    background = self._background_faces()
+    if not background:
+      neighbors = [owners[owners >= 0] for _, owners in self._face_owners(voxel_ids)]
+    self._mark_dirty(self.batches.positions[voxel_ids], self.batches.sizes[voxel_ids])
+    self._unindex_batches(voxel_ids)
+    self.dirty_instances.update(voxel_ids.tolist())
+    self.batches.release(voxel_ids)
+    if not background:
+      self._update_faces(np.concatenate(neighbors))
     self.needs_update = True
 
+  def start_mesh_worker(self):
+    if self.mesh_worker is None:
+      self.mesh_worker = MeshWorker()
+      self._sync_faces()
+
+  def enable_mesh_pool(self, processes=None):
+    """
+    Lets large rebuilds (greedy, or faces meshed in the background) use a
+    process pool. The pool is only started by the first rebuild of at least
+    mesh_pool_threshold chunks.
+    """
+    self.mesh_pool_enabled = True
+    self.mesh_processes = processes
+
+  def process_mesh_results(self, budget):
+    """
+    Applies at most budget finished background meshes. Chunks keep their
+    previous buffers until a result for their latest edit arrives. A pooled
+    rebuild arrives as one result but its chunk meshes are queued and
+    applied a budget at a time.
+    """
+    if self.mesh_worker is None:
+      return 0
+    applied = 0
+    for job, result in self.mesh_worker.drain(budget):
+      kind, key = job
+      if kind == 'greedy':
+        if self.chunk_jobs.get(key) == job:
+          self._accept_chunk_mesh(key, result)
+          applied += 1
+      elif kind == 'rebuild':
+        meshes = result or {}
+        for chunk_key in key:
+          if self.chunk_jobs.get(chunk_key) != job:
+            continue
+          if chunk_key in meshes:
+            self.pooled_meshes[chunk_key] = meshes[chunk_key]
+          else:
+            del self.chunk_jobs[chunk_key]
+      elif kind == 'faces':
+        if self.chunk_jobs.get(key) == job:
+          self._accept_faces(key, result)
+          applied += 1
+    accept = self._accept_faces if self.mesh_mode == 'faces' else self._accept_chunk_mesh
+    for key in list(self.pooled_meshes)[:max(budget - applied, 0)]:
+      accept(key, self.pooled_meshes.pop(key))
+      applied += 1
+    if applied:
+      self.needs_update = True
+    return applied
+
+  def _accept_faces(self, key, result):
+    del self.chunk_jobs[key]
+    if result is None:
+      return
+    voxel_ids, masks, upload = result
+    self.dirty_instances.update(voxel_ids[self.batches.face_masks[voxel_ids] != masks].tolist())
+    self.batches.face_masks[voxel_ids] = masks
+    self._upload_chunk(key, upload)
+
+  def _accept_chunk_mesh(self, key, mesh):
+    del self.chunk_jobs[key]
+    self._set_chunk_mesh(key, mesh)
+
+  def _set_chunk_mesh(self, key, mesh):
+    if mesh is None:
+      self.chunk_meshes.pop(key, None)
+    else:
+      self.chunk_meshes[key] = mesh
+    self.dirty_buffers.add(key)
+
+  def _use_mesh_pool(self, count):
+    """True when a rebuild of count chunks should go to the process pool, starting it if needed."""
+    if count < self.mesh_pool_threshold:
+      return False
+    if self.mesh_pool is None and self.mesh_pool_enabled:
+      self.mesh_pool = MeshPool(self.mesh_processes)
+    return self.mesh_pool is not None
+
+  def _submit_rebuild(self, keys, build, tasks):
+    job = ('rebuild', tuple(keys))
+    for key in keys:
+      self.chunk_jobs[key] = job
+      self.pooled_meshes.pop(key, None)
+    self.mesh_worker.submit(job, build, tasks)
+
+  def _rebuild_chunk_meshes(self):
+    palette = np.array(self.palette, dtype=np.float32).reshape(-1, 3)
+    if self._use_mesh_pool(len(self.dirty_chunks)):
+      tasks = self.mesh_pool.snapshot(self.voxels, self.dirty_chunks, palette)
+      if self.mesh_worker is not None:
+        self._submit_rebuild(self.dirty_chunks, self.mesh_pool.mesh_chunks, tasks)
+      else:
+        for key, mesh in self.mesh_pool.mesh_chunks(tasks).items():
+          self._set_chunk_mesh(key, mesh)
+      self.dirty_chunks = set()
+      return
+    for key in self.dirty_chunks:
+      cells = read_chunk(self.voxels, key)
+      if self.mesh_worker is not None:
+        self.chunk_jobs[key] = ('greedy', key)
+        self.pooled_meshes.pop(key, None)
+        self.mesh_worker.submit(('greedy', key), mesh_chunk_cells, key, cells, palette)
+      else:
+        self._set_chunk_mesh(key, mesh_chunk_cells(key, cells, palette))
+    self.dirty_chunks = set()
+
+  def _chunk_geometries(self, key):
+    if self.mesh_mode == 'greedy':
+      return [self.chunk_meshes.get(key)]
+    voxel_ids = sorted(self.chunk_batches.get(key, ()))
+    slots = self.batches.geometry_slots[voxel_ids].tolist()
+    return [self.geometry_data[slot] for slot in slots]
+
+  def _upload_chunk(self, key, upload):
+    self.chunk_draw_list = None
+    buffers = self.chunk_buffers.get(key)
+    if upload is None:
+      if buffers is not None:
+        buffers.delete()
+        del self.chunk_buffers[key]
+      return
+    if buffers is None:
+      buffers = self.chunk_buffers[key] = ChunkBuffers(self.vertex_format)
+    buffers.upload(*upload)
+
+  def _upload_chunks(self):
+    if self._background_faces():
+      palette = np.array(self.palette, dtype=np.float32).reshape(-1, 3)
+      if self._use_mesh_pool(len(self.dirty_buffers)):
+        keys = [key for key in self.dirty_buffers if key in self.chunk_batches]
+        for key in self.dirty_buffers.difference(keys):
+          self._submit_faces(key, palette)
+        self._submit_rebuild(keys, self.mesh_pool.mesh_faces, self.faces_tasks(keys, palette))
+        return
+      for key in self.dirty_buffers:
+        self._submit_faces(key, palette)
+      return
+    for key in self.dirty_buffers:
+      self._upload_chunk(key, prepare_upload(self._chunk_geometries(key), self.vertex_format))
+
+  def faces_tasks(self, keys, palette):
+    """(key, mesh_faces arguments) of each chunk in keys, as MeshPool.mesh_faces takes them."""
+    return [(key, self._faces_task(key, palette)) for key in keys]
+
+  def _faces_task(self, key, palette):
+    """
+    Arguments of mesh_faces for one chunk. The snapshot covers the chunk
+    and its six face slabs when it holds batches that fit in it, plus the
+    face slabs of each batch that reaches past it.
+    """
+    voxel_ids = np.array(sorted(self.chunk_batches[key]), dtype=np.int64)
+    positions = self.batches.positions[voxel_ids].astype(np.int64)
+    sizes = self.batches.sizes[voxel_ids].astype(np.int64)
+    origin = np.array(key, dtype=np.int64) * CHUNK_SIZE
+    fits = (positions + sizes[:, None] <= origin + CHUNK_SIZE).all(axis=1)
+    boxes = [(origin, CHUNK_SIZE)] + face_slab_boxes(origin, CHUNK_SIZE) if fits.any() else []
+    for position, size in zip(positions[~fits].tolist(), sizes[~fits].tolist()):
+      boxes.extend(face_slab_boxes(position, size))
+    colors = palette[self.batches.colors[voxel_ids]]
+    return voxel_ids, CellSnapshot(self.voxels, boxes), positions, sizes, colors, self.vertex_format
+
+  def _submit_faces(self, key, palette):
+    if key not in self.chunk_batches:
+      self.chunk_jobs.pop(key, None)
+      self._upload_chunk(key, None)
+      return
+    job = ('faces', key)
+    self.chunk_jobs[key] = job
+    self.mesh_worker.submit(job, mesh_faces, *self._faces_task(key, palette))
+
+  def _upload_pool(self):
+    if self.pool is None:
+      self.pool = GeometryPool(self.vertex_format)
+    if self.mesh_mode == 'greedy':
+      updates = [(key, self.chunk_meshes.get(key)) for key in self.dirty_buffers]
+    else:
+      updates = [(slot, self.geometry_data[slot]) for slot in self.dirty_slots]
+    for key, geometry in updates:
+      if geometry is None or not len(geometry['indices']):
+        self.pool.release(key)
+      else:
+        vertices = geometry['vertices']
+        self.pool.write(key, encode_vertices(vertices, self.vertex_format), geometry['indices'], vertex_bounds(vertices))
+
+  def _upload_instances(self):
+    if self.instances is None:
+      self.instances = InstancedCubes()
+    palette = np.array(self.palette, dtype=np.float32).reshape(-1, 3)
+    self.instances.write(self.batches, palette, sorted(self.dirty_instances))
+
+  def _drop_stale_lods(self):
+    for key in self.stale_lods:
+      for level in range(1, len(LOD_FACTORS)):
+        buffers = self.lod_buffers.pop((key, level), None)
+        if buffers is not None:
+          buffers.delete()
+    self.stale_lods.clear()
+
+  def _lod_thresholds(self):
+    settings = (tuple(self.lod_distances), self.lod_hysteresis)
+    if self.lod_bounds is None or self.lod_bounds[0] != settings:
+      # Squared, to compare against squared distances.
+      thresholds = np.array(self.lod_distances, dtype=np.float64)
+      lower = np.r_[-np.inf, (thresholds * (1 - self.lod_hysteresis)) ** 2]
+      upper = np.r_[(thresholds * (1 + self.lod_hysteresis)) ** 2, np.inf]
+      self.lod_bounds = (settings, thresholds ** 2, lower, upper)
+    return self.lod_bounds
+
+  def _select_lod_levels(self, draw_list, eye):
+    """
+    Per-buffer LOD levels of draw_list for eye, with hysteresis around each
+    threshold. Works in place on the draw list's level and scratch arrays,
+    and returns the previous levels untouched when neither the eye, the
+    buffers nor the LOD settings changed.
+    """
+    centers, levels, offsets, distances, target, inside, within, bound = draw_list[5:]
+    settings, thresholds, lower, upper = self._lod_thresholds()
+    state = (settings, float(eye[0]), float(eye[1]), float(eye[2]))
+    if self.lod_state is not None and self.lod_state[0] is draw_list and self.lod_state[1] == state:
+      return levels
+    self.lod_state = (draw_list, state)
+    np.subtract(centers, state[1:], out=offsets)
+    np.multiply(offsets, offsets, out=offsets)
+    np.sum(offsets, axis=1, out=distances)
+    target.fill(0)
+    for threshold in thresholds:
+      np.greater(distances, threshold, out=inside)
+      np.add(target, inside, out=target)
+    np.take(lower, levels, out=bound)
+    np.greater_equal(distances, bound, out=inside)
+    np.take(upper, levels, out=bound)
+    np.less_equal(distances, bound, out=within)
+    np.logical_and(inside, within, out=inside)
+    np.copyto(target, levels, where=inside)
+    np.copyto(levels, target)
+    return levels
+
+  def _lod_buffers(self, key, level, palette):
+    if (key, level) in self.lod_buffers:
+      return self.lod_buffers[(key, level)]
+    self.lod_builds += 1
+    mesh = build_lod_mesh(self.voxels, key, LOD_FACTORS[level], palette, self._lod_excluded())
+    buffers = None
+    if mesh is not None:
+      buffers = ChunkBuffers(self.vertex_format)
+      buffers.upload(encode_vertices(mesh['vertices'], self.vertex_format), mesh['indices'], vertex_bounds(mesh['vertices']))
+    self.lod_buffers[(key, level)] = buffers
+    return buffers
+
+  def _lod_excluded(self):
+    """
+    In faces mode, batches reaching past their origin chunk make its buffer
+    draw at full detail, so LOD meshes of the chunks they cross leave their
+    cells out instead of drawing the same surfaces a second time.
+    """
+    if self.mesh_mode != 'faces':
+      return None
+    if self.oversized_batches is None:
+      self.oversized_batches = self._oversized(self.batches.live_ids())
+    return self.oversized_batches
+
+  def _oversized(self, voxel_ids):
+    """The batches among voxel_ids that reach past their origin chunk."""
+    local = self.batches.positions[voxel_ids] & (CHUNK_SIZE - 1)
+    return voxel_ids[(local + self.batches.sizes[voxel_ids, None] > CHUNK_SIZE).any(axis=1)]
+
+  def _draw_chunks(self, planes, eye):
+    if self.chunk_draw_list is None:
+      keys = list(self.chunk_buffers)
+      buffers = [self.chunk_buffers[key] for key in keys]
+      lo = np.array([b.bounds[0] for b in buffers], dtype=np.float64).reshape(-1, 3)
+      hi = np.array([b.bounds[1] for b in buffers], dtype=np.float64).reshape(-1, 3)
+      # A faces-mode buffer holds whole batches by origin chunk, so a large
+      # block can reach past its chunk; LOD meshes only cover the chunk
+      # itself, so such buffers always draw at full detail.
+      corners = np.array(keys, dtype=np.float64).reshape(-1, 3) * CHUNK_SIZE
+      fits = ((lo >= corners) & (hi <= corners + CHUNK_SIZE)).all(axis=1)
+      if self.lod_state is not None:
+        previous = self.lod_state[0]
+        self.chunk_levels.update(zip(previous[0], previous[6].tolist()))
+        self.lod_state = None
+      count = len(keys)
+      self.chunk_draw_list = (
+        keys, buffers, lo, hi, fits,
+        (lo + hi) * 0.5,
+        np.array([self.chunk_levels.get(key, 0) for key in keys], dtype=np.int64),
+        np.empty((count, 3)), np.empty(count), np.empty(count, dtype=np.int64),
+        np.empty(count, dtype=bool), np.empty(count, dtype=bool), np.empty(count)
+      )
+    keys, buffers, lo, hi, fits = self.chunk_draw_list[:5]
+    visible = np.flatnonzero(boxes_in_frustum(planes, lo, hi)) if planes is not None else np.arange(len(buffers))
+    self.lod_stats = [0] * len(LOD_FACTORS)
+    if eye is None or not self.lod_enabled:
+      for i in visible.tolist():
+        buffers[i].draw()
+      self.lod_stats[0] = len(visible)
+      return len(buffers), len(visible)
+
+    self._drop_stale_lods()
+    self.lod_builds = 0
+    palette = None
+    levels = self._select_lod_levels(self.chunk_draw_list, eye)
+    for i in visible.tolist():
+      level = int(levels[i]) if fits[i] else 0
+      if level:
+        if palette is None:
+          palette = np.array(self.palette, dtype=np.float32).reshape(-1, 3)
+        if (keys[i], level) in self.lod_buffers or self.lod_builds < self.lod_build_budget:
+          lod = self._lod_buffers(keys[i], level, palette)
+          if lod is not None:
+            lod.draw()
+          self.lod_stats[level] += 1
+          continue
+      buffers[i].draw()
+      self.lod_stats[0] += 1
+    return len(buffers), len(visible)
+
   def update_buffers(self):
     if not self.needs_update:
       return
-    vertices = []
-    indices = []
-    offset = 0
-    for b in self.batches:
-      if b is None:
-        continue
-      
-      geometry_index = b['geometry_index']
-      if geometry_index >= len(self.geometry_data) or self.geometry_data[geometry_index] is None:
-        continue
-        
-      geometry = self.geometry_data[geometry_index]
-      v = np.array(geometry['vertices'], dtype=np.float32)
-      i = np.array(geometry['indices'], dtype=np.uint32) + offset
-      vertices.extend(v)
-      indices.extend(i)
-      offset += len(v) // self.vertex_stride
-      
-    vertices = np.array(vertices, dtype=np.float32)
-    indices = np.array(indices, dtype=np.uint32)
-    glBindVertexArray(self.VAO)
-    glBindBuffer(GL_ARRAY_BUFFER, self.VBO)
-    glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
-    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.EBO)
-    glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
-    stride = self.vertex_stride * 4
-    glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
-    glEnableVertexAttribArray(0)
-    glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(12))
-    glEnableVertexAttribArray(1)
-    glVertexAttribPointer(2, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(24))
-    glEnableVertexAttribArray(2)
-    glBindVertexArray(0)
-    self.index_count = len(indices)
+    self.rebuild_count += 1
+    if self.mesh_mode == 'greedy':
+      self._rebuild_chunk_meshes()
+    if self.mesh_mode == 'instanced':
+      self._upload_instances()
+      self.mesh_stats['vertices'] = 24 * len(self.batches)
+      self.mesh_stats['triangles'] = 12 * len(self.batches)
+      self.mesh_stats['buffer_bytes'] = self.instances.nbytes
+    elif self.buffer_mode == 'pool':
+      self._upload_pool()
+      self.mesh_stats['vertices'] = self.pool.vertex_count
+      self.mesh_stats['triangles'] = self.pool.index_count // 3
+      self.mesh_stats['buffer_bytes'] = self.pool.nbytes
+    else:
+      self._upload_chunks()
+      self.mesh_stats['vertices'] = sum(b.vertex_count for b in self.chunk_buffers.values())
+      self.mesh_stats['triangles'] = sum(b.index_count for b in self.chunk_buffers.values()) // 3
+      self.mesh_stats['buffer_bytes'] = sum(b.nbytes for b in self.chunk_buffers.values())
+    self.dirty_buffers = set()
+    self.dirty_slots = set()
+    self.dirty_instances = set()
+    self.dirty_chunks = set()
+    live = self.batches.live_ids()
+    self.mesh_stats['face_vertices'] = int(np.unpackbits(self.batches.face_masks[live]).sum()) * self.vertices_per_face
     self.needs_update = False
+    self._print_report()
 
-  def draw(self, pvm_matrix):
+  def draw(self, pvm_matrix, eye=None):
     self.update_buffers()
+    if not self.shader_program:
+      self._load_shader(self._shader_variant())
     glUseProgram(self.shader_program)
-    mvp_location = glGetUniformLocation(self.shader_program, "mvp")
-    glUniformMatrix4fv(mvp_location, 1, GL_FALSE, pvm_matrix.T)
-    ldx, ldy = 30, 30
-    light_dir = -np.array([
-      np.cos(np.radians(ldx)) * np.cos(np.radians(ldy)),
-      -np.sin(np.radians(ldy)),
-      np.sin(np.radians(ldx)) * np.cos(np.radians(ldy))
-    ], dtype=np.float32)
-    light_color = np.array([1.0, 1.0, 0.95], dtype=np.float32)
-    ambient_intensity = 0.4
-    glUniform3fv(glGetUniformLocation(self.shader_program, "lightDir"), 1, light_dir)
-    glUniform3fv(glGetUniformLocation(self.shader_program, "lightColor"), 1, light_color)
-    glUniform1f(glGetUniformLocation(self.shader_program, "ambientIntensity"), ambient_intensity)
-    glBindVertexArray(self.VAO)
+    glUniformMatrix4fv(self.mvp_location, 1, GL_TRUE, pvm_matrix)
     # glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
-    glDrawElements(GL_TRIANGLES, self.index_count, GL_UNSIGNED_INT, None)
+    planes = frustum_planes(pvm_matrix) if self.frustum_culling else None
+    drawn = total = 0
+    if self.instances is not None:
+      self.instances.draw(self.batches.high_water)
+      drawn = total = len(self.batches)
+    if self.pool is not None:
+      total += len(self.pool)
+      drawn += self.pool.draw(planes)
+    if self.chunk_buffers:
+      chunk_total, chunk_drawn = self._draw_chunks(planes, eye)
+      total += chunk_total
+      drawn += chunk_drawn
+    self.cull_stats['drawn'] = drawn
+    self.cull_stats['culled'] = total - drawn
     glBindVertexArray(0)
     glUseProgram(0)
 
   def cleanup(self):
-    if hasattr(self, 'VAO') and self.VAO:
-      glDeleteVertexArrays(1, [self.VAO])
-      self.VAO = 0
-    if hasattr(self, 'VBO') and self.VBO:
-      glDeleteBuffers(1, [self.VBO])
-      self.VBO = 0
-    if hasattr(self, 'EBO') and self.EBO:
-      glDeleteBuffers(1, [self.EBO])
-      self.EBO = 0
+    if self.mesh_worker is not None:
+      self.mesh_worker.stop()
+      self.mesh_worker = None
+    if self.mesh_pool is not None:
+      self.mesh_pool.close()
+      self.mesh_pool = None
+    self._drop_buffers()
     if hasattr(self, 'shader_program') and self.shader_program:
       glDeleteProgram(self.shader_program)
       self.shader_program = 0